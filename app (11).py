@@ -1,11 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
+import altair as alt
 import io
-from datetime import datetime, timedelta
+import os
+import operator
+from collections import deque, namedtuple
+from datetime import datetime
+from hiv_chatbot import (
+    HIVExpertChatbot, CD4_AHD_THRESHOLD, CD4_LOW_THRESHOLD, VL_SUPPRESSION_THRESHOLD, BMI_UNDERWEIGHT
+)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -34,696 +38,180 @@ exploring analytics, and interacting with **comprehensive HIV/AIDS expert chatbo
 # -------------------------------
 # Load Model
 # -------------------------------
-try:
-    deploy = joblib.load("ahd_model_C_hybrid_fixed.pkl")
+def fitted_estimators(estimator):
+    """Yield a fitted estimator and every fitted estimator nested inside it"""
+    yield estimator
+    for calibrated in getattr(estimator, 'calibrated_classifiers_', ()):
+        yield from fitted_estimators(calibrated.estimator)
+    for _, step in getattr(estimator, 'steps', ()):
+        yield from fitted_estimators(step)
+    for member in getattr(estimator, 'estimators_', ()):
+        yield from fitted_estimators(member)
+    if hasattr(estimator, 'final_estimator_'):
+        yield from fitted_estimators(estimator.final_estimator_)
+
+@st.cache_resource
+def load_model(path):
+    """Load the deployed model bundle once per process"""
+    # Imported here: the cached loader is its only user, so later reruns skip it
+    import joblib
+    deploy = joblib.load(path)
     model = deploy['model']
-    feature_names = deploy['feature_names']
+    feature_names = tuple(deploy['feature_names'])
+    # Predictions here are a row or a clinic's worth of rows, where joblib
+    # dispatching work to worker threads costs more than scoring inline
+    for estimator in fitted_estimators(model):
+        if getattr(estimator, 'n_jobs', None) not in (None, 1):
+            estimator.n_jobs = 1
+    # The model was fitted on a DataFrame and remembers its column order;
+    # refuse a bundle whose feature list disagrees rather than score
+    # shuffled columns silently
+    names_in = next((estimator.feature_names_in_ for estimator in fitted_estimators(model)
+                     if hasattr(estimator, 'feature_names_in_')), None)
+    if names_in is not None and tuple(names_in) != feature_names:
+        raise ValueError("feature_names in the model bundle do not match the columns the model was fitted on")
+    # Warm-up prediction so the first real click doesn't pay for lazy
+    # threadpool/validation setup inside sklearn
+    model.predict_proba(pd.DataFrame(np.zeros((1, len(feature_names)), dtype=np.float32), columns=feature_names))
+    # C-level getter that pulls the inputs out of a dict in model column order
+    return model, feature_names, operator.itemgetter(*feature_names)
+
+# Resolved next to this script so the cached bundle is found (and keyed the
+# same) whichever directory Streamlit is launched from
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ahd_model_C_hybrid_fixed.pkl")
+
+try:
+    model, feature_names, feature_getter = load_model(MODEL_PATH)
     model_loaded = True
 except Exception as e:
     st.error(f"⚠️ Could not load model: {e}")
     model_loaded = False
 
 # -------------------------------
-# ENHANCED COMPREHENSIVE HIV/AIDS EXPERT CHATBOT CLASS
+# Feature Engineering
 # -------------------------------
-class HIVExpertChatbot:
-    def __init__(self):
-        self.current_year = 2025
-        self.statistics = {
-            "global": {
-                "total_cases": "38.4 million",
-                "new_infections_2023": "1.3 million",
-                "aids_related_deaths_2023": "630,000",
-                "art_coverage": "76%"
-            },
-            "africa": {
-                "total_cases": "25.6 million",
-                "new_infections_2023": "800,000",
-                "aids_related_deaths_2023": "380,000",
-                "art_coverage": "78%",
-                "most_affected": "Eastern and Southern Africa"
-            },
-            "kenya": {
-                "total_cases": "1.4 million",
-                "prevalence_rate": "4.5%",
-                "new_infections_2023": "32,000",
-                "aids_related_deaths_2023": "19,000",
-                "art_coverage": "85%",
-                "mother_to_child_transmission": "8.7%"
-            }
-        }
-        
-        self.treatment_regimens = {
-            "first_line": {
-                "preferred": [
-                    "TDF + 3TC/FTC + DTG (Dolutegravir)",
-                    "TAF + 3TC/FTC + DTG",
-                    "TDF + 3TC/FTC + EFV (Efavirenz)"
-                ],
-                "alternative": [
-                    "AZT + 3TC + DTG",
-                    "ABC + 3TC + DTG"
-                ]
-            },
-            "second_line": {
-                "options": [
-                    "TDF/FTC + DTG (if failed on NNRTI-based regimen)",
-                    "AZT + 3TC + ATV/r (Atazanavir/ritonavir)",
-                    "TDF + 3TC + LPV/r (Lopinavir/ritonavir)"
-                ]
-            },
-            "third_line": {
-                "options": [
-                    "DRV/r + DTG + optimized NRTI backbone",
-                    "Newer agents: Bictegravir, Doravirine"
-                ]
-            }
-        }
-
-        self.ncd_integration = {
-            "hypertension": {
-                "prevalence_hiv": "35-40%",
-                "management": "ACE inhibitors preferred, monitor drug interactions with ART",
-                "screening": "Every clinical visit, control target <140/90 mmHg"
-            },
-            "diabetes": {
-                "prevalence_hiv": "10-15%",
-                "management": "Metformin first-line, watch for interactions with PIs",
-                "screening": "Annual fasting glucose, HbA1c every 6 months"
-            },
-            "mental_health": {
-                "depression_prevalence": "20-30%",
-                "management": "SSRIs compatible with ART, avoid St. John's wort",
-                "screening": "PHQ-9 at every clinical visit"
-            }
-        }
-
-        self.myths_misconceptions = {
-            "transmission": [
-                "HIV CANNOT be transmitted through: kissing, hugging, shaking hands, sharing utensils, toilet seats, mosquitoes",
-                "HIV CAN be transmitted through: unprotected sex, sharing needles, mother-to-child during pregnancy/birth/breastfeeding",
-                "People on treatment with undetectable viral load CANNOT transmit HIV sexually (U=U)"
-            ],
-            "treatment": [
-                "MYTH: You don't need ART if you feel fine - FACT: HIV damages immune system even without symptoms",
-                "MYTH: ART is toxic and will make you sick - FACT: Modern ART has minimal side effects",
-                "MYTH: You can stop treatment once viral load is undetectable - FACT: Treatment is lifelong"
-            ],
-            "prevention": [
-                "MYTH: PrEP is only for gay men - FACT: PrEP works for everyone at risk",
-                "MYTH: Condoms are 100% effective - FACT: Condoms are highly effective but not 100%",
-                "MYTH: You can tell if someone has HIV by looking - FACT: HIV has no specific visible signs"
-            ]
-        }
-
-    def get_statistics(self, region="global"):
-        """Get HIV statistics for different regions"""
-        if region.lower() in self.statistics:
-            stats = self.statistics[region.lower()]
-            response = f"**HIV Statistics for {region.upper()} ({self.current_year} estimates):**\n\n"
-            
-            for key, value in stats.items():
-                display_key = key.replace('_', ' ').title()
-                response += f"• **{display_key}**: {value}\n"
-            
-            response += f"\n*Source: WHO/UNAIDS {self.current_year} estimates*"
-            return response
-        else:
-            return f"Statistics for {region} not available. Try 'global', 'africa', or 'kenya'."
-
-    def get_treatment_info(self, regimen_type="first_line"):
-        """Get detailed treatment regimen information"""
-        if regimen_type in self.treatment_regimens:
-            regimen = self.treatment_regimens[regimen_type]
-            response = f"**{regimen_type.replace('_', ' ').title()} ART Regimens:**\n\n"
-            
-            if "preferred" in regimen:
-                response += "**Preferred Regimens:**\n"
-                for option in regimen["preferred"]:
-                    response += f"• {option}\n"
-                response += "\n"
-            
-            if "alternative" in regimen:
-                response += "**Alternative Regimens:**\n"
-                for option in regimen["alternative"]:
-                    response += f"• {option}\n"
-                response += "\n"
-            
-            if "options" in regimen:
-                for option in regimen["options"]:
-                    response += f"• {option}\n"
-            
-            response += f"\n*Based on WHO {self.current_year} Consolidated Guidelines*"
-            return response
-        else:
-            return "Regimen type not found. Try 'first_line', 'second_line', or 'third_line'."
-
-    def get_ncd_info(self, condition=None):
-        """Get information about HIV and NCD comorbidities"""
-        if condition and condition.lower() in self.ncd_integration:
-            ncd = self.ncd_integration[condition.lower()]
-            response = f"**HIV and {condition.title()} Comorbidity Management:**\n\n"
-            
-            for key, value in ncd.items():
-                display_key = key.replace('_', ' ').title()
-                response += f"• **{display_key}**: {value}\n"
-            
-            response += f"\n*Key Considerations:*\n"
-            if condition.lower() == "hypertension":
-                response += "- Avoid drug interactions between ART and antihypertensives\n"
-                response += "- Monitor renal function with TDF-containing regimens\n"
-                response += "- Target BP <140/90 mmHg in PLHIV\n"
-            elif condition.lower() == "diabetes":
-                response += "- PI-based regimens may increase diabetes risk\n"
-                response += "- Monitor weight gain with newer INSTIs\n"
-                response += "- Screen all PLHIV for diabetes annually\n"
-            elif condition.lower() == "mental_health":
-                response += "- Depression affects ART adherence significantly\n"
-                response += "- Integrated mental health services improve outcomes\n"
-                response += "- Screen all patients with PHQ-9 at each visit\n"
-            
-            return response
-        else:
-            response = "**HIV and Non-Communicable Diseases (NCDs):**\n\n"
-            response += "Common NCDs in PLHIV:\n"
-            for condition in self.ncd_integration.keys():
-                response += f"• {condition.title()}\n"
-            response += "\nAsk about specific conditions for detailed management guidelines."
-            return response
-
-    def get_myths_info(self, category=None):
-        """Get information about HIV myths and misconceptions"""
-        if category and category.lower() in self.myths_misconceptions:
-            myths = self.myths_misconceptions[category.lower()]
-            response = f"**HIV Myths & Facts - {category.title()}: **\n\n"
-            
-            for myth in myths:
-                response += f"• {myth}\n"
-            
-            return response
-        else:
-            response = "**Common HIV Myths and Misconceptions:**\n\n"
-            response += "**Categories:**\n"
-            for category in self.myths_misconceptions.keys():
-                response += f"• {category.title()}\n"
-            response += "\nAsk about specific categories for detailed myth-busting information."
-            return response
-
-    def get_mental_health_info(self):
-        """Comprehensive mental health information for PLHIV"""
-        return """**Mental Health and HIV - Comprehensive Guide**
-
-**Common Mental Health Conditions in PLHIV:**
-• **Depression**: 20-30% prevalence - screen with PHQ-9
-• **Anxiety disorders**: 15-20% prevalence - screen with GAD-7
-• **HIV-associated neurocognitive disorders (HAND)**: 15-50%
-• **Substance use disorders**: Higher prevalence than general population
-• **PTSD**: Common after HIV diagnosis
-
-**Screening Recommendations:**
-• **PHQ-9**: At every clinical visit for depression
-• **GAD-7**: For anxiety symptoms
-• **MMSE**: For cognitive impairment if symptoms present
-• **AUDIT**: For alcohol use disorders
-
-**Treatment Approaches:**
-• **Integrated care**: Mental health services within HIV clinics
-• **Pharmacotherapy**: SSRIs (compatible with ART)
-• **Psychotherapy**: CBT, supportive therapy, group therapy
-• **Peer support**: Support groups for PLHIV
-
-**Key Considerations:**
-• Mental health affects ART adherence and outcomes
-• Stigma prevents help-seeking behavior
-• Integrated services improve both mental health and HIV outcomes"""
-
-    def interpret_prediction(self, prediction, probability, features):
-        """Interpret model prediction with clinical insights"""
-        risk_level = "High" if prediction == 1 else "Low"
-        
-        interpretation = f"**Prediction Interpretation:**\n\n"
-        interpretation += f"• **Risk Level**: {risk_level}\n"
-        interpretation += f"• **Probability**: {probability:.1%}\n"
-        interpretation += f"• **Confidence**: {'High' if probability > 0.7 or probability < 0.3 else 'Moderate'}\n\n"
-        
-        interpretation += "**Key Contributing Factors:**\n"
-        
-        cd4 = features.get('Latest CD4 Result', 0)
-        if cd4 < 200:
-            interpretation += f"• **Critical CD4**: {cd4} cells/mm³ (AHD threshold <200)\n"
-        elif cd4 < 350:
-            interpretation += f"• **Low CD4**: {cd4} cells/mm³ (needs close monitoring)\n"
-        
-        vl = features.get('Last VL Result', 0)
-        vl_suppressed = features.get('VL_Suppressed', 0)
-        if not vl_suppressed and vl > 0:
-            interpretation += f"• **Unsuppressed VL**: {vl:,} copies/mL\n"
-        
-        who_stage_3 = features.get('Last_WHO_Stage_3', 0)
-        who_stage_4 = features.get('Last_WHO_Stage_4', 0)
-        if who_stage_4:
-            interpretation += f"• **WHO Stage 4**: Severe symptoms present\n"
-        elif who_stage_3:
-            interpretation += f"• **WHO Stage 3**: Advanced symptoms present\n"
-        
-        bmi = features.get('BMI', 0)
-        if bmi < 18.5:
-            interpretation += f"• **Low BMI**: {bmi:.1f} (underweight)\n"
-        elif bmi > 30:
-            interpretation += f"• **High BMI**: {bmi:.1f} (obese)\n"
-        
-        interpretation += "\n**Clinical Recommendations:**\n"
-        if prediction == 1:
-            interpretation += "• **Urgent ART initiation** (within 7 days)\n"
-            interpretation += "• **Comprehensive OI screening** (TB, cryptococcus)\n"
-            interpretation += "• **Cotrimoxazole preventive therapy**\n"
-            interpretation += "• **Enhanced adherence counseling**\n"
-            interpretation += "• **Close follow-up** (2-4 weeks)\n"
-            interpretation += "• **Mental health screening** (PHQ-9, anxiety)\n"
-            interpretation += "• **NCD screening** (hypertension, diabetes)\n"
-        else:
-            interpretation += "• **Continue routine ART care**\n"
-            interpretation += "• **Standard monitoring schedule**\n"
-            interpretation += "• **Prevention counseling**\n"
-            interpretation += "• **Regular viral load monitoring**\n"
-            interpretation += "• **Annual NCD screening**\n"
-            interpretation += "• **Mental health assessment**\n"
-        
-        return interpretation
-
-    def get_response(self, user_input):
-        user_input = user_input.lower().strip()
-        
-        # Enhanced natural language understanding
-        # Statistics queries
-        if any(word in user_input for word in ["statistic", "prevalence", "rate", "number", "data", "how many", "cases"]):
-            if "kenya" in user_input or "nairobi" in user_input:
-                return self.get_statistics("kenya")
-            elif "africa" in user_input or "african" in user_input:
-                return self.get_statistics("africa")
-            elif "global" in user_input or "world" in user_input or "international" in user_input:
-                return self.get_statistics("global")
-            else:
-                return self.get_statistics("global")
-
-        # Treatment queries
-        elif any(word in user_input for word in ["treatment", "regimen", "art", "medication", "drug", "first-line", "second-line", "third-line", "arv"]):
-            if "second" in user_input:
-                return self.get_treatment_info("second_line")
-            elif "third" in user_input:
-                return self.get_treatment_info("third_line")
-            else:
-                return self.get_treatment_info("first_line")
-
-        # NCD and comorbidity queries
-        elif any(word in user_input for word in ["ncd", "comorbidity", "hypertension", "blood pressure", "diabetes", "sugar", "mental health", "depression", "anxiety", "psych"]):
-            if "hypertension" in user_input or "blood pressure" in user_input or "bp" in user_input:
-                return self.get_ncd_info("hypertension")
-            elif "diabetes" in user_input or "sugar" in user_input:
-                return self.get_ncd_info("diabetes")
-            elif "mental" in user_input or "depression" in user_input or "anxiety" in user_input or "psych" in user_input:
-                return self.get_mental_health_info()
-            else:
-                return self.get_ncd_info()
-
-        # Myths and misconceptions
-        elif any(word in user_input for word in ["myth", "misconception", "false", "wrong", "believe", "think", "rumor", "stigma"]):
-            if "transmit" in user_input or "spread" in user_input or "catch" in user_input:
-                return self.get_myths_info("transmission")
-            elif "treatment" in user_input or "art" in user_input or "med" in user_input:
-                return self.get_myths_info("treatment")
-            elif "prevent" in user_input or "prevention" in user_input or "condom" in user_input:
-                return self.get_myths_info("prevention")
-            else:
-                return self.get_myths_info()
-
-        # PMTCT queries
-        elif any(word in user_input for word in ["pmtct", "pregnant", "pregnancy", "mother", "child", "vertical transmission", "breastfeed", "delivery"]):
-            return self._get_pmtct_info()
-
-        # TB-HIV coinfection
-        elif any(word in user_input for word in ["tb", "tuberculosis", "coinfection", "lung"]):
-            return self._get_tb_hiv_info()
-
-        # Mental health specific
-        elif any(word in user_input for word in ["depression", "anxiety", "mental", "psychology", "stress", "trauma"]):
-            return self.get_mental_health_info()
-
-        # Basic definitions
-        elif any(phrase in user_input for phrase in ["what is hiv", "define hiv", "hiv means", "hiv definition"]):
-            return self._get_hiv_definition()
-        
-        elif any(phrase in user_input for phrase in ["what is ahd", "define ahd", "ahd means", "advanced hiv"]):
-            return self._get_ahd_definition()
-        
-        elif any(phrase in user_input for phrase in ["what is cd4", "define cd4", "cd4 means", "cd4 cells"]):
-            return self._get_cd4_definition()
-        
-        elif any(phrase in user_input for phrase in ["what is viral load", "define viral load", "viral load means", "vl"]):
-            return self._get_viral_load_definition()
-        
-        elif any(phrase in user_input for phrase in ["what is art", "define art", "art means", "antiretroviral"]):
-            return self._get_art_definition()
-
-        elif any(word in user_input for word in ["prevent", "prevention", "prep", "pep", "condom", "safe sex"]):
-            return self._get_prevention_info()
-
-        elif any(word in user_input for word in ["transmit", "transmission", "spread", "catch", "get hiv"]):
-            return self._get_transmission_info()
-
-        elif any(word in user_input for word in ["symptom", "sign", "feel", "experience", "show"]):
-            return self._get_symptoms_info()
-
-        elif any(word in user_input for word in ["test", "testing", "diagnose", "result", "positive", "negative"]):
-            return self._get_testing_info()
-
-        elif any(word in user_input for word in ["oi", "opportunistic", "infection", "cryptococcus", "pjp", "toxo"]):
-            return self._get_oi_info()
-
-        elif "who stage" in user_input or "staging" in user_input:
-            return self._get_who_staging()
-
-        elif any(word in user_input for word in ["hello", "hi", "hey", "greetings", "good morning", "good afternoon"]):
-            return "Hello! I'm your HIV/AIDS expert assistant. How can I help you with HIV-related questions today?"
-
-        else:
-            return self._get_comprehensive_response(user_input)
-
-    def _get_hiv_definition(self):
-        return """**HIV (Human Immunodeficiency Virus) - Comprehensive Overview**
-
-**Definition:** HIV is a virus that attacks the body's immune system, specifically targeting CD4 cells (T-helper cells), which are crucial for fighting infections.
-
-**Virology:**
-- **Family**: Retroviridae
-- **Types**: HIV-1 (most common worldwide), HIV-2 (primarily West Africa)
-- **Structure**: Enveloped virus with RNA genome
-
-**Pathophysiology:**
-1. **Entry**: Binds to CD4 receptors and co-receptors (CCR5, CXCR4)
-2. **Integration**: Reverse transcriptase converts RNA to DNA, integrates into host genome
-3. **Replication**: Uses host cell machinery to produce new virus particles
-4. **Immune Destruction**: Progressive loss of CD4 cells leading to immunodeficiency
-
-**Global Impact**: Affected 38.4 million people worldwide in 2023"""
-
-    def _get_ahd_definition(self):
-        return """**Advanced HIV Disease (AHD) - Comprehensive Definition**
-
-**Definition:** AHD refers to advanced stage of HIV infection characterized by severe immunodeficiency, defined as:
-- CD4 cell count <200 cells/mm³ **OR**
-- WHO Clinical Stage 3 or 4 disease **regardless of CD4 count**
+# Sidebar choices, shared as immutable module constants across reruns
+WHO_STAGE_OPTIONS = (1, 2, 3, 4)
+CD4_RISK_OPTIONS = ("Severe", "Moderate", "Normal", "Unknown")
+SEX_OPTIONS = ("Female", "Male")
+
+# One-hot encodings as (Severe, Moderate, Normal) and (Stage 2, 3, 4);
+# anything else (e.g. "Unknown", stage 1) encodes as all zeros
+CD4_RISK_ONE_HOT = {"Severe": (1, 0, 0), "Moderate": (0, 1, 0), "Normal": (0, 0, 1)}
+WHO_STAGE_ONE_HOT = {2: (1, 0, 0), 3: (0, 1, 0), 4: (0, 0, 1)}
+NO_ONE_HOT = (0, 0, 0)
+
+def derive_features(age, weight, height, cd4, vl, months_rx, who_stage, cd4_risk, sex):
+    """Map raw patient inputs to the model's feature dict"""
+    bmi = weight / ((height / 100) ** 2) if height > 0 else 0
+    cd4_missing = 0 if cd4 > 0 else 1
+    vl_missing = 0 if vl > 0 else 1
+    vl_suppressed = 1 if vl < VL_SUPPRESSION_THRESHOLD else 0
+
+    cd4_risk_Severe, cd4_risk_Moderate, cd4_risk_Normal = CD4_RISK_ONE_HOT.get(cd4_risk, NO_ONE_HOT)
+    Last_WHO_Stage_2, Last_WHO_Stage_3, Last_WHO_Stage_4 = WHO_STAGE_ONE_HOT.get(who_stage, NO_ONE_HOT)
+    Sex_M = 1 if sex.lower().startswith("m") else 0
+
+    Active_in_PMTCT_Missing = 0
+    Cacx_Screening_Missing = 0
+    Refill_Date_Missing = 0
+
+    return {
+        'Age at reporting': age,
+        'Weight': weight,
+        'Height': height,
+        'BMI': bmi,
+        'Latest CD4 Result': cd4,
+        'CD4_Missing': cd4_missing,
+        'Last VL Result': vl,
+        'VL_Suppressed': vl_suppressed,
+        'VL_Missing': vl_missing,
+        'Months of Prescription': months_rx,
+        'cd4_risk_Moderate': cd4_risk_Moderate,
+        'cd4_risk_Normal': cd4_risk_Normal,
+        'cd4_risk_Severe': cd4_risk_Severe,
+        'Last_WHO_Stage_2': Last_WHO_Stage_2,
+        'Last_WHO_Stage_3': Last_WHO_Stage_3,
+        'Last_WHO_Stage_4': Last_WHO_Stage_4,
+        'Active_in_PMTCT_Missing': Active_in_PMTCT_Missing,
+        'Cacx_Screening_Missing': Cacx_Screening_Missing,
+        'Refill_Date_Missing': Refill_Date_Missing,
+        'Sex_M': Sex_M
+    }
 
-**Epidemiology:**
-- 15-20% of people starting ART present with AHD
-- Higher mortality in first 3 months of treatment
-- More common in late presenters and re-starters
-
-**Management Principles:**
-1. **Rapid ART initiation** (within 7 days, same day if possible)
-2. **Comprehensive OI package**: screening, prevention, treatment
-3. **Enhanced adherence support**
-4. **Close clinical monitoring** (2-4 week intervals)
-5. **Integrated mental health and NCD screening**"""
-
-    def _get_cd4_definition(self):
-        return """**CD4 Cells - Comprehensive Explanation**
-
-**Definition:** CD4 cells (cluster of differentiation 4) are T-helper lymphocytes that play a central role in adaptive immune responses.
-
-**Normal Physiology:**
-- **Normal range**: 500-1500 cells/mm³
-- **Function**: Coordinate immune response, activate B cells and cytotoxic T cells
-
-**HIV Impact:**
-- **Direct killing**: HIV replication destroys CD4 cells
-- **Chronic activation**: Leads to exhaustion and apoptosis
-
-**Clinical Interpretation:**
-- **>500**: Normal immune function
-- **200-500**: Mild to moderate immunodeficiency
-- **<200**: Severe immunodeficiency (AHD criteria)
-- **<100**: Critical risk for opportunistic infections"""
-
-    def _get_viral_load_definition(self):
-        return """**Viral Load - Comprehensive Explanation**
-
-**Definition:** Viral load measures the amount of HIV RNA in blood plasma, expressed as copies per milliliter (copies/mL).
-
-**Clinical Significance:**
-- **Treatment efficacy**: Primary marker of ART success
-- **Transmission risk**: Higher VL increases transmission probability
-
-**Interpretation:**
-- **Suppressed**: <1000 copies/mL (treatment goal)
-- **Undetectable**: <50 copies/mL (optimal suppression)
-- **Unsuppressed**: ≥1000 copies/mL (needs intervention)
-
-**Public Health Impact:**
-- **U=U**: Undetectable = Untransmittable
-- **Treatment as prevention**: ART reduces transmission by 96%"""
-
-    def _get_art_definition(self):
-        return """**ART (Antiretroviral Therapy) - Comprehensive Overview**
-
-**Definition:** ART refers to the combination of antiretroviral drugs used to treat HIV infection.
-
-**Classes of ARVs:**
-1. **NRTIs**: Nucleoside Reverse Transcriptase Inhibitors (TDF, 3TC, ABC)
-2. **NNRTIs**: Non-Nucleoside Reverse Transcriptase Inhibitors (EFV, NVP)
-3. **PIs**: Protease Inhibitors (LPV/r, ATV/r)
-4. **INSTIs**: Integrase Strand Transfer Inhibitors (DTG, RAL)
-
-**Treatment Principles:**
-- **Combination therapy**: Minimum 3 drugs from ≥2 classes
-- **Adherence**: >95% adherence required for success
-- **Lifelong treatment**: No current cure, but controllable
-- **Rapid initiation**: Start ASAP after diagnosis"""
-
-    def _get_prevention_info(self):
-        return """**HIV Prevention - Comprehensive Strategies**
-
-**Biomedical Interventions:**
-- **PrEP** (Pre-Exposure Prophylaxis): Daily TDF/FTC for HIV-negative at-risk individuals
-- **PEP** (Post-Exposure Prophylaxis): 28-day ART course started within 72 hours of exposure
-- **VMMC** (Voluntary Medical Male Circumcision): 60% reduction in female-to-male transmission
-- **Treatment as Prevention**: ART reduces transmission risk by 96%
-
-**Behavioral Interventions:**
-- **Condom use**: Male and female condoms
-- **Harm reduction**: Needle exchange programs for PWID
-- **Testing and counseling**: Regular HIV testing
-
-**Structural Interventions:**
-- **Stigma reduction programs**
-- **Legal protections**
-- **Economic empowerment**
-- **Comprehensive sex education**"""
-
-    def _get_transmission_info(self):
-        return """**HIV Transmission - Comprehensive Guide**
-
-**Established Routes:**
-1. **Sexual Transmission** (75-85% of cases)
-   - Unprotected anal/vaginal sex
-   - Higher risk: receptive anal > insertive anal > vaginal
-
-2. **Blood-borne Transmission**
-   - Contaminated needles (PWID, healthcare)
-   - Blood transfusions (rare with screening)
-
-3. **Perinatal Transmission**
-   - During pregnancy, delivery, or breastfeeding
-   - Risk: 15-45% without intervention, <5% with ART
-
-**NO Transmission Through:**
-- Kissing, hugging, shaking hands
-- Sharing utensils, toilet seats
-- Mosquito bites, sweat, tears
-- Swimming pools, air
-
-**Risk Reduction:**
-- **ART**: Viral suppression eliminates sexual transmission
-- **Condoms**: 80-95% reduction in transmission
-- **PrEP**: >90% reduction when adherent
-- **Medical male circumcision**: 60% reduction in male acquisition"""
-
-    def _get_symptoms_info(self):
-        return """**HIV Symptoms - Comprehensive Overview**
-
-**Acute HIV Infection (2-4 weeks post-exposure):**
-- Fever, chills, rash
-- Sore throat, mouth ulcers
-- Fatigue, muscle aches
-- Swollen lymph nodes
-- Night sweats
-
-**Clinical Latency Stage (Asymptomatic):**
-- May last 8-10 years without treatment
-- Progressive immune decline continues
-
-**Symptomatic HIV (Moderate Immunodeficiency):**
-- Recurrent respiratory infections
-- Herpes zoster (shingles)
-- Oral candidiasis (thrush)
-- Chronic diarrhea
-- Unexplained weight loss
-
-**AIDS-Defining Conditions (Severe Immunodeficiency):**
-- Opportunistic infections (PJP, toxoplasmosis, cryptococcosis)
-- HIV wasting syndrome (>10% weight loss)
-- Kaposi sarcoma, lymphomas
-- HIV-associated neurocognitive disorders"""
-
-    def _get_testing_info(self):
-        return """**HIV Testing - Comprehensive Guide**
-
-**Testing Technologies:**
-1. **Rapid Tests** (Point-of-care)
-   - Results in 20 minutes
-   - Fingerstick or oral fluid
-   - >99% sensitivity/specificity
-
-2. **4th Generation ELISA**
-   - Detects both p24 antigen and antibodies
-   - Window period: 2-3 weeks
-   - Gold standard for diagnosis
-
-3. **Viral Load PCR**
-   - For infant diagnosis and treatment monitoring
-   - Not for routine diagnosis
-
-**Testing Recommendations:**
-- **Universal**: All adults/adolescents at least once
-- **High-risk**: Every 3-6 months
-- **Pregnant women**: Every pregnancy
-- **Partner testing**: Encourage mutual disclosure"""
-
-    def _get_oi_info(self):
-        return """**Opportunistic Infections - Comprehensive Guide**
-
-**Common OIs in AHD:**
-
-1. **Tuberculosis (TB)**
-   - Most common OI globally
-   - Screening: Symptom screen at every visit
-   - Prevention: Isoniazid preventive therapy (IPT)
-
-2. **Cryptococcal Meningitis**
-   - CD4 <100, high mortality
-   - Screening: CrAg in blood if CD4 <100
-   - Treatment: Amphotericin B + flucytosine
-
-3. **Pneumocystis jirovecii Pneumonia (PJP)**
-   - CD4 <200, subacute respiratory symptoms
-   - Prophylaxis: Cotrimoxazole if CD4 <200
-
-4. **Toxoplasmosis**
-   - CD4 <100, CNS symptoms
-   - Prophylaxis: Cotrimoxazole
-
-**Prevention Strategy:**
-- **Cotrimoxazole**: CD4 <200 or WHO stage 3/4
-- **Fluconazole**: CD4 <100 in endemic areas
-- **IPT**: TB preventive therapy"""
-
-    def _get_who_staging(self):
-        return """**WHO Clinical Staging System - Comprehensive**
-
-**Stage 1:** Asymptomatic, Persistent generalized lymphadenopathy
-
-**Stage 2:** Moderate unexplained weight loss, Recurrent respiratory infections, Herpes zoster
-
-**Stage 3:** Unexplained severe weight loss, Unexplained chronic diarrhea, Pulmonary tuberculosis
-
-**Stage 4 (AIDS-Defining):** HIV wasting syndrome, Pneumocystis pneumonia, Extrapulmonary tuberculosis, Kaposi sarcoma
-
-**Clinical Utility:**
-- Guides OI prophylaxis needs
-- Determines ART urgency
-- Predicts disease progression
-- Informs prognosis and monitoring frequency"""
-
-    def _get_pmtct_info(self):
-        return """**Prevention of Mother-to-Child Transmission (PMTCT) - Comprehensive Guide**
-
-**Four-Pronged Approach:**
-1. **Primary prevention** of HIV in women
-2. **Prevent unintended pregnancies** in HIV+ women
-3. **Prevent transmission** to infants
-4. **Provide treatment and support** to HIV+ mothers and families
-
-**ART in Pregnancy:**
-- **Preferred**: TDF + 3TC/FTC + DTG
-- **Start ASAP** regardless of CD4 or gestational age
-- **Continue throughout** pregnancy, delivery, and breastfeeding
-
-**Infant Prophylaxis:**
-- **High risk**: NVP for 6-12 weeks
-- **Low risk**: NVP for 6 weeks
-- **Breastfeeding**: Continue maternal ART, infant prophylaxis if high risk
-
-**Delivery Planning:**
-- **Viral load <1000**: Vaginal delivery appropriate
-- **Viral load ≥1000**: Consider C-section at 38 weeks
-- **Avoid invasive procedures** if unknown status
-
-**Breastfeeding:**
-- **Recommend**: Exclusive breastfeeding for 6 months
-- **Continue**: ART throughout breastfeeding period
-- **Wean gradually** over 1 month when transitioning"""
-
-    def _get_tb_hiv_info(self):
-        return """**TB-HIV Coinfection Management - Comprehensive Guide**
-
-**Epidemiology:**
-- **HIV increases TB risk** 15-20 times
-- **Leading cause of death** in PLHIV
-- **Global burden**: 8% of TB cases are HIV-positive
-
-**Screening:**
-- **At every visit**: WHO 4-symptom screen (cough, fever, night sweats, weight loss)
-- **If any symptom**: GeneXpert MTB/RIF preferred
-- **All TB patients**: Routine HIV testing
-
-**Diagnosis Challenges:**
-- **Atypical presentations** in advanced HIV
-- **Higher rates** of extrapulmonary TB
-- **Lower sensitivity** of sputum smear
-
-**Treatment:**
-- **Start ART** within 2 weeks of TB treatment (all CD4 counts)
-- **Watch for**: Immune reconstitution inflammatory syndrome (IRIS)
-- **Drug interactions**: Rifampicin reduces PI levels
-
-**Prevention:**
-- **IPT** for all PLHIV without active TB
-- **Duration**: 6-36 months depending on setting
-- **TPT** (TB preventive therapy) reduces mortality by 37%"""
-
-    def _get_comprehensive_response(self, user_input):
-        return f"""I understand you're asking about: "{user_input}"
-
-I want to provide you with accurate, evidence-based information about HIV/AIDS. 
-
-I specialize in comprehensive HIV topics including:
-• **HIV treatment guidelines** and ART regimens
-• **Prevention strategies** (PrEP, PEP, condoms, U=U)
-• **Testing and diagnosis** approaches  
-• **WHO clinical staging** and management
-• **Opportunistic infections** and prevention
-• **PMTCT** and pediatric HIV care
-• **TB-HIV coinfection** management
-• **HIV and NCDs** (hypertension, diabetes, mental health)
-• **Mental health integration** in HIV care
-• **Myths and misconceptions** about HIV
-• **Epidemiology and statistics**
-
-Could you please rephrase your question or ask about one of these specific HIV/AIDS topics? I'm here to provide you with the most current, evidence-based information."""
+# Raw clinical inputs for batch scoring, one CSV column per sidebar field
+RAW_NUMERIC_COLUMNS = ('Age', 'Weight', 'Height', 'CD4_Count', 'Viral_Load', 'Months_of_Prescription', 'WHO_Stage')
+RAW_INPUT_COLUMNS = RAW_NUMERIC_COLUMNS + ('CD4_Risk', 'Sex')
+
+# The one-hot tables as row lookups: get_indexer gives -1 for anything unlisted,
+# which picks the trailing all-zero row
+CD4_RISK_INDEX = pd.Index(list(CD4_RISK_ONE_HOT))
+CD4_RISK_ROWS = np.array([*CD4_RISK_ONE_HOT.values(), NO_ONE_HOT])
+WHO_STAGE_INDEX = pd.Index(list(WHO_STAGE_ONE_HOT))
+WHO_STAGE_ROWS = np.array([*WHO_STAGE_ONE_HOT.values(), NO_ONE_HOT])
+
+def derive_batch_features(raw):
+    """Vectorised derive_features over a DataFrame of raw inputs, one row per patient"""
+    weight, height = raw['Weight'], raw['Height']
+    cd4, vl = raw['CD4_Count'], raw['Viral_Load']
+    cd4_risk = CD4_RISK_ROWS[CD4_RISK_INDEX.get_indexer(raw['CD4_Risk'].astype(str).str.strip().str.capitalize())]
+    who_stage = WHO_STAGE_ROWS[WHO_STAGE_INDEX.get_indexer(raw['WHO_Stage'])]
+    not_recorded = np.zeros(len(raw), dtype=int)
+
+    return pd.DataFrame({
+        'Age at reporting': raw['Age'],
+        'Weight': weight,
+        'Height': height,
+        'BMI': (weight / (height / 100) ** 2).where(height > 0, 0),
+        'Latest CD4 Result': cd4,
+        'CD4_Missing': (~(cd4 > 0)).astype(int),
+        'Last VL Result': vl,
+        'VL_Suppressed': (vl < VL_SUPPRESSION_THRESHOLD).astype(int),
+        'VL_Missing': (~(vl > 0)).astype(int),
+        'Months of Prescription': raw['Months_of_Prescription'],
+        'cd4_risk_Moderate': cd4_risk[:, 1],
+        'cd4_risk_Normal': cd4_risk[:, 2],
+        'cd4_risk_Severe': cd4_risk[:, 0],
+        'Last_WHO_Stage_2': who_stage[:, 0],
+        'Last_WHO_Stage_3': who_stage[:, 1],
+        'Last_WHO_Stage_4': who_stage[:, 2],
+        'Active_in_PMTCT_Missing': not_recorded,
+        'Cacx_Screening_Missing': not_recorded,
+        'Refill_Date_Missing': not_recorded,
+        'Sex_M': raw['Sex'].astype(str).str.strip().str.lower().str.startswith('m').astype(int),
+    }, index=raw.index)
+
+# Clinical role of each model feature, shown alongside its value in the
+# feature table; anything unlisted is reported as 'Other'
+FEATURE_SIGNIFICANCE = {
+    'Age at reporting': 'Demographic factor',
+    'Sex_M': 'Demographic factor',
+    'Weight': 'Nutritional indicator',
+    'Height': 'Nutritional indicator',
+    'BMI': 'Nutritional indicator',
+    'Latest CD4 Result': 'Critical immunologic marker',
+    'CD4_Missing': 'Critical immunologic marker',
+    'Last VL Result': 'Virologic marker',
+    'VL_Suppressed': 'Virologic marker',
+    'VL_Missing': 'Virologic marker',
+    'Months of Prescription': 'Treatment adherence indicator',
+    'Last_WHO_Stage_2': 'Disease severity indicator',
+    'Last_WHO_Stage_3': 'Disease severity indicator',
+    'Last_WHO_Stage_4': 'Disease severity indicator',
+    'cd4_risk_Moderate': 'Risk stratification',
+    'cd4_risk_Normal': 'Risk stratification',
+    'cd4_risk_Severe': 'Risk stratification',
+    'Active_in_PMTCT_Missing': 'Data quality indicator',
+    'Cacx_Screening_Missing': 'Data quality indicator',
+    'Refill_Date_Missing': 'Data quality indicator',
+}
 
 # -------------------------------
 # ENHANCED ANALYTICS DASHBOARD CLASS
 # -------------------------------
+# One dashboard finding; severity is carried in the emoji-tagged type
+Insight = namedtuple("Insight", "type title message recommendation")
+
 class ClinicAnalytics:
     def __init__(self):
         self.who_targets = {
@@ -735,7 +223,7 @@ class ClinicAnalytics:
     
     def generate_sample_data(self, clinic_type="urban"):
         """Generate realistic synthetic clinic data"""
-        np.random.seed(42)
+        rng = np.random.default_rng(42)
         n_patients = 300
         
         if clinic_type == "urban":
@@ -749,68 +237,77 @@ class ClinicAnalytics:
             retention_rate = 0.72
             late_presenters = 0.25
         
-        data = []
-        for i in range(n_patients):
-            age = np.random.normal(38, 12)
-            age = max(18, min(80, age))
-            
-            cd4 = np.random.gamma(3, base_cd4/3)
-            cd4 = max(50, min(1200, cd4))
-            
-            if np.random.random() < suppression_rate:
-                viral_load = np.random.lognormal(2.5, 0.8)
-            else:
-                viral_load = np.random.lognormal(8, 1.5)
-            viral_load = int(max(20, viral_load))
-            
-            if cd4 < 200:
-                who_stage = np.random.choice([3, 4], p=[0.6, 0.4])
-            elif cd4 < 350:
-                who_stage = np.random.choice([2, 3], p=[0.7, 0.3])
-            else:
-                who_stage = np.random.choice([1, 2], p=[0.8, 0.2])
-            
-            if np.random.random() < late_presenters:
-                months_art = np.random.randint(1, 6)
-            else:
-                months_art = np.random.randint(6, 60)
-            
-            missed_visits = np.random.poisson(0.3 if np.random.random() < retention_rate else 2.5)
-            
-            patient = {
-                'Patient_ID': f'PAT{1000 + i}',
-                'Age': int(age),
-                'Gender': np.random.choice(['Male', 'Female'], p=[0.45, 0.55]),
-                'CD4_Count': int(cd4),
-                'Viral_Load': viral_load,
-                'WHO_Stage': who_stage,
-                'Months_on_ART': months_art,
-                'Last_Visit_Date': (datetime.now() - timedelta(days=np.random.randint(0, 90))).strftime('%Y-%m-%d'),
-                'ART_Regimen': np.random.choice(['TDF/3TC/DTG', 'TAF/FTC/DTG', 'AZT/3TC/EFV'], p=[0.6, 0.3, 0.1]),
-                'Clinic_Location': 'Urban' if clinic_type == 'urban' else 'Rural',
-                'Missed_Visits': missed_visits
-            }
-            data.append(patient)
+        # Whole columns per draw; branches become masks over both alternatives
+        age = np.clip(rng.normal(38, 12, n_patients), 18, 80)
+        cd4 = np.clip(rng.gamma(3, base_cd4/3, n_patients), 50, 1200)
+        
+        suppressed = rng.random(n_patients) < suppression_rate
+        viral_load = np.where(suppressed, rng.lognormal(2.5, 0.8, n_patients), rng.lognormal(8, 1.5, n_patients))
+        viral_load = np.maximum(20, viral_load).astype(int)
+        
+        # One uniform draw per patient, thresholded against the CD4 band's split
+        u = rng.random(n_patients)
+        who_stage = np.select(
+            [cd4 < CD4_AHD_THRESHOLD, cd4 < CD4_LOW_THRESHOLD],
+            [np.where(u < 0.6, 3, 4), np.where(u < 0.7, 2, 3)],
+            default=np.where(u < 0.8, 1, 2)
+        )
         
-        return pd.DataFrame(data)
+        late = rng.random(n_patients) < late_presenters
+        months_art = np.where(late, rng.integers(1, 6, n_patients), rng.integers(6, 60, n_patients))
+        
+        retained = rng.random(n_patients) < retention_rate
+        missed_visits = rng.poisson(np.where(retained, 0.3, 2.5))
+        
+        # Categorical columns: bucket one uniform draw on cumulative probabilities
+        gender = np.array(['Male', 'Female'])[np.searchsorted([0.45], rng.random(n_patients), side='right')]
+        regimen = np.array(['TDF/3TC/DTG', 'TAF/FTC/DTG', 'AZT/3TC/EFV'])[
+            np.searchsorted([0.6, 0.9], rng.random(n_patients), side='right')
+        ]
+        
+        # Day arithmetic on datetime64[D]; its string form is already YYYY-MM-DD
+        today = np.datetime64(datetime.now().date(), 'D')
+        last_visit = (today - rng.integers(0, 90, n_patients)).astype(str)
+        
+        return pd.DataFrame({
+            'Patient_ID': [f'PAT{1000 + i}' for i in range(n_patients)],
+            'Age': age.astype(int),
+            'Gender': gender,
+            'CD4_Count': cd4.astype(int),
+            'Viral_Load': viral_load,
+            'WHO_Stage': who_stage,
+            'Months_on_ART': months_art,
+            'Last_Visit_Date': last_visit,
+            'ART_Regimen': regimen,
+            'Clinic_Location': 'Urban' if clinic_type == 'urban' else 'Rural',
+            'Missed_Visits': missed_visits
+        })
     
     def analyze_clinic_data(self, df):
         """Comprehensive analysis of clinic data"""
+        # Pull each numeric column out once and reduce the plain arrays; float
+        # so missing values are NaN (skipped by the means, never below a cutoff)
+        age = df['Age'].to_numpy(dtype=float)
+        cd4 = df['CD4_Count'].to_numpy(dtype=float)
+        vl = df['Viral_Load'].to_numpy(dtype=float)
+        art = df['Months_on_ART'].to_numpy(dtype=float)
+        missed = df['Missed_Visits'].to_numpy(dtype=float)
+        
         analysis = {}
         
         analysis['total_patients'] = len(df)
-        analysis['avg_age'] = df['Age'].mean()
+        analysis['avg_age'] = np.nanmean(age)
         analysis['gender_distribution'] = df['Gender'].value_counts(normalize=True)
-        analysis['ahd_cases'] = (df['CD4_Count'] < 200).mean() * 100
-        analysis['avg_cd4'] = df['CD4_Count'].mean()
-        analysis['viral_suppression'] = (df['Viral_Load'] < 1000).mean() * 100
-        analysis['undetectable'] = (df['Viral_Load'] < 50).mean() * 100
+        analysis['ahd_cases'] = (cd4 < CD4_AHD_THRESHOLD).mean() * 100
+        analysis['avg_cd4'] = np.nanmean(cd4)
+        analysis['viral_suppression'] = (vl < VL_SUPPRESSION_THRESHOLD).mean() * 100
+        analysis['undetectable'] = (vl < 50).mean() * 100
         analysis['who_stage_dist'] = df['WHO_Stage'].value_counts(normalize=True).sort_index()
-        analysis['new_patients'] = (df['Months_on_ART'] < 6).mean() * 100
-        analysis['experienced_patients'] = (df['Months_on_ART'] >= 12).mean() * 100
-        analysis['avg_art_duration'] = df['Months_on_ART'].mean()
-        analysis['good_retention'] = (df['Missed_Visits'] <= 1).mean() * 100
-        analysis['poor_retention'] = (df['Missed_Visits'] > 2).mean() * 100
+        analysis['new_patients'] = (art < 6).mean() * 100
+        analysis['experienced_patients'] = (art >= 12).mean() * 100
+        analysis['avg_art_duration'] = np.nanmean(art)
+        analysis['good_retention'] = (missed <= 1).mean() * 100
+        analysis['poor_retention'] = (missed > 2).mean() * 100
         
         return analysis
     
@@ -819,70 +316,275 @@ class ClinicAnalytics:
         insights = []
         
         if analysis['ahd_cases'] > 20:
-            insights.append({
-                'type': '🚨 CRITICAL',
-                'title': 'High AHD Prevalence',
-                'message': f"{analysis['ahd_cases']:.1f}% of patients have Advanced HIV Disease",
-                'recommendation': 'Implement same-day ART initiation and enhance community testing'
-            })
+            insights.append(Insight(
+                type='🚨 CRITICAL',
+                title='High AHD Prevalence',
+                message=f"{analysis['ahd_cases']:.1f}% of patients have Advanced HIV Disease",
+                recommendation='Implement same-day ART initiation and enhance community testing'
+            ))
         elif analysis['ahd_cases'] > 10:
-            insights.append({
-                'type': '⚠️ WARNING', 
-                'title': 'Moderate AHD Cases',
-                'message': f"{analysis['ahd_cases']:.1f}% AHD prevalence needs monitoring",
-                'recommendation': 'Strengthen early detection and rapid linkage to care'
-            })
+            insights.append(Insight(
+                type='⚠️ WARNING',
+                title='Moderate AHD Cases',
+                message=f"{analysis['ahd_cases']:.1f}% AHD prevalence needs monitoring",
+                recommendation='Strengthen early detection and rapid linkage to care'
+            ))
         
         suppression_gap = self.who_targets['viral_suppression'] - analysis['viral_suppression']
         if suppression_gap > 20:
-            insights.append({
-                'type': '🚨 CRITICAL',
-                'title': 'Low Viral Suppression',
-                'message': f"Only {analysis['viral_suppression']:.1f}% suppression ({suppression_gap:.1f}% below target)",
-                'recommendation': 'Enhanced adherence counseling and regimen review'
-            })
+            insights.append(Insight(
+                type='🚨 CRITICAL',
+                title='Low Viral Suppression',
+                message=f"Only {analysis['viral_suppression']:.1f}% suppression ({suppression_gap:.1f}% below target)",
+                recommendation='Enhanced adherence counseling and regimen review'
+            ))
         elif suppression_gap > 10:
-            insights.append({
-                'type': '⚠️ WARNING',
-                'title': 'Suppression Below Target',
-                'message': f"{analysis['viral_suppression']:.1f}% suppression needs improvement",
-                'recommendation': 'Focus on patients with unsuppressed viral load'
-            })
+            insights.append(Insight(
+                type='⚠️ WARNING',
+                title='Suppression Below Target',
+                message=f"{analysis['viral_suppression']:.1f}% suppression needs improvement",
+                recommendation='Focus on patients with unsuppressed viral load'
+            ))
         
         if analysis['poor_retention'] > 20:
-            insights.append({
-                'type': '⚠️ WARNING',
-                'title': 'Patient Retention Issues',
-                'message': f"{analysis['poor_retention']:.1f}% of patients missing multiple visits",
-                'recommendation': 'Implement appointment reminders and community follow-up'
-            })
+            insights.append(Insight(
+                type='⚠️ WARNING',
+                title='Patient Retention Issues',
+                message=f"{analysis['poor_retention']:.1f}% of patients missing multiple visits",
+                recommendation='Implement appointment reminders and community follow-up'
+            ))
         
-        young_patients = df[df['Age'] < 25]
-        if len(young_patients) > 0:
-            young_suppression = (young_patients['Viral_Load'] < 1000).mean() * 100
+        # Masks over the raw columns rather than slicing out a sub-DataFrame
+        young = df['Age'].to_numpy(dtype=float) < 25
+        n_young = young.sum()
+        if n_young > 0:
+            suppressed = df['Viral_Load'].to_numpy(dtype=float) < VL_SUPPRESSION_THRESHOLD
+            young_suppression = (young & suppressed).sum() / n_young * 100
             if young_suppression < 70:
-                insights.append({
-                    'type': '🎯 TARGETED',
-                    'title': 'Youth Engagement Challenge',
-                    'message': f"Young patients (18-25) have only {young_suppression:.1f}% suppression",
-                    'recommendation': 'Develop youth-friendly services and peer support programs'
-                })
+                insights.append(Insight(
+                    type='🎯 TARGETED',
+                    title='Youth Engagement Challenge',
+                    message=f"Young patients (18-25) have only {young_suppression:.1f}% suppression",
+                    recommendation='Develop youth-friendly services and peer support programs'
+                ))
         
         if analysis['avg_cd4'] < 300:
-            insights.append({
-                'type': '📊 MONITOR',
-                'title': 'CD4 Recovery Needs Attention',
-                'message': f"Average CD4 count is {analysis['avg_cd4']:.0f} cells/mm³",
-                'recommendation': 'Review patients with slow immune recovery'
-            })
+            insights.append(Insight(
+                type='📊 MONITOR',
+                title='CD4 Recovery Needs Attention',
+                message=f"Average CD4 count is {analysis['avg_cd4']:.0f} cells/mm³",
+                recommendation='Review patients with slow immune recovery'
+            ))
         
         return insights
 
 # -------------------------------
 # INITIALIZE COMPONENTS
 # -------------------------------
-chatbot = HIVExpertChatbot()
-analytics_engine = ClinicAnalytics()
+@st.cache_resource
+def get_chatbot():
+    """Build the (read-only) expert chatbot once per process"""
+    return HIVExpertChatbot()
+
+@st.cache_resource
+def get_analytics_engine():
+    """Build the (read-only) analytics engine once per process"""
+    return ClinicAnalytics()
+
+# Low-cardinality text columns, stored as categories (integer codes + labels)
+CATEGORY_COLUMNS = ('Gender', 'ART_Regimen', 'Clinic_Location')
+
+def compact_dtypes(df):
+    """Shrink integer columns to the smallest fitting width and repeated text to categories"""
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype('category')
+    return df
+
+@st.cache_data(show_spinner=False)
+def load_sample_data(clinic_type):
+    """Synthetic clinic cohort, generated once per clinic type (seeded)"""
+    return compact_dtypes(get_analytics_engine().generate_sample_data(clinic_type))
+
+@st.cache_data(show_spinner=False)
+def read_clinic_csv(data):
+    """Parse an uploaded clinic CSV, once per distinct file content"""
+    # PyArrow (a Streamlit dependency) parses the columns on multiple threads,
+    # but rejects files the default C engine accepts (e.g. a row with more
+    # fields than the header), so those fall back to the C engine
+    try:
+        df = pd.read_csv(io.BytesIO(data), engine='pyarrow')
+    except ValueError:
+        df = pd.read_csv(io.BytesIO(data))
+    return compact_dtypes(df)
+
+@st.cache_data(show_spinner=False)
+def clinic_findings(df):
+    """KPIs and insight fields for a clinic dataset, recomputed only when the data changes"""
+    engine = get_analytics_engine()
+    analysis = engine.analyze_clinic_data(df)
+    # Cached as plain tuples: Insight belongs to this script's per-run
+    # __main__, which pickle can't resolve reliably across sessions
+    return analysis, [tuple(insight) for insight in engine.generate_insights(analysis, df)]
+
+def analyze_clinic(df):
+    """KPIs and insights for a clinic dataset (cached via clinic_findings)"""
+    analysis, insights = clinic_findings(df)
+    return analysis, [Insight._make(fields) for fields in insights]
+
+@st.cache_data(show_spinner=False)
+def band_codes(values, edges):
+    """int8 band per value and patients per band, binned as pd.cut over (0, *edges, inf]"""
+    values = np.asarray(values, dtype=float)
+    codes = np.digitize(values, edges, right=True).astype(np.int8)
+    # -1 marks values pd.cut leaves out (non-positive or missing)
+    codes[~(values > 0)] = -1
+    return codes, np.bincount(codes[codes >= 0], minlength=len(edges) + 1)
+
+@st.cache_data(show_spinner=False)
+def csv_bytes(df):
+    """CSV export of a DataFrame, serialised once per distinct content"""
+    # A fixed "\n" terminator keeps the export identical across platforms
+    return df.to_csv(index=False, lineterminator="\n").encode("utf-8")
+
+def category_bar_chart(labels, counts, colors, title):
+    """Bar chart of patients per category, rendered client-side by Vega-Lite"""
+    data = pd.DataFrame({'Category': labels, 'Patients': counts})
+    base = alt.Chart(data, title=title).encode(
+        x=alt.X('Category:N', sort=list(labels), title=None, axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y('Patients:Q', title='Number of Patients'),
+    )
+    bars = base.mark_bar(opacity=0.8, stroke='black', strokeWidth=0.5).encode(
+        color=alt.Color('Category:N', scale=alt.Scale(domain=list(labels), range=list(colors)), legend=None)
+    )
+    value_labels = base.mark_text(dy=-8, fontWeight='bold').encode(text='Patients:Q')
+    return bars + value_labels
+
+def histogram_chart(values, bins, color, xlabel, title, unit):
+    """Histogram with a dashed mean line, rendered client-side by Vega-Lite"""
+    # Binned here exactly as Matplotlib's hist did; only the counts are shipped
+    values = values.dropna()
+    counts, edges = np.histogram(values, bins=bins)
+    data = pd.DataFrame({'start': edges[:-1], 'end': edges[1:], 'Patients': counts})
+    bars = alt.Chart(data, title=title).mark_bar(opacity=0.7, color=color, stroke='black', strokeWidth=0.5).encode(
+        x=alt.X('start:Q', bin='binned', title=xlabel),
+        x2='end:Q',
+        y=alt.Y('Patients:Q', title='Number of Patients'),
+    )
+    mean = values.mean()
+    marker = alt.Chart(pd.DataFrame({'mean': [mean], 'label': [f"Mean: {mean:.1f} {unit}"]}))
+    rule = marker.mark_rule(color='red', strokeDash=[6, 4], strokeWidth=2).encode(x='mean:Q')
+    label = marker.mark_text(align='left', dx=4, color='red', fontWeight='bold').encode(
+        x='mean:Q', y=alt.value(8), text='label:N'
+    )
+    return bars + rule + label
+
+def pie_chart(counts, title, colors=None, text_color='black'):
+    """Pie chart of value counts with percentage labels, rendered client-side by Vega-Lite"""
+    labels = [str(label) for label in counts.index]
+    data = pd.DataFrame({'Category': labels, 'Patients': counts.to_numpy(), 'Order': range(len(labels))})
+    data['Share'] = data['Patients'] / data['Patients'].sum()
+    # Colours go to slices in count order, as Matplotlib's pie assigned them
+    scale = (alt.Scale(domain=labels, range=list(colors)) if colors is not None
+             else alt.Scale(domain=labels, scheme='set3'))
+    base = alt.Chart(data, title=title).encode(
+        theta=alt.Theta('Patients:Q', stack=True),
+        order=alt.Order('Order:Q'),
+    )
+    slices = base.mark_arc(outerRadius=120, stroke='white').encode(
+        color=alt.Color('Category:N', scale=scale, sort=labels, legend=alt.Legend(title=None)),
+        tooltip=['Category:N', 'Patients:Q', alt.Tooltip('Share:Q', format='.1%')],
+    )
+    shares = base.mark_text(radius=80, fontWeight='bold', color=text_color).encode(
+        text=alt.Text('Share:Q', format='.1%')
+    )
+    return slices + shares
+
+# Card styling per insight severity: (background, border, text colour, icon)
+INSIGHT_STYLES = {
+    '🚨 CRITICAL': ('#ffebee', '#d32f2f', '#b71c1c', '🚨'),
+    '⚠️ WARNING': ('#fff3e0', '#f57c00', '#e65100', '⚠️'),
+    '🎯 TARGETED': ('#e8f5e8', '#388e3c', '#1b5e20', '🎯'),
+    '📊 MONITOR': ('#e3f2fd', '#1976d2', '#0d47a1', '📊'),
+}
+
+def insight_card(insight):
+    """HTML card for one insight, coloured by its severity"""
+    bg_color, border_color, text_color, icon = INSIGHT_STYLES.get(insight.type, INSIGHT_STYLES['📊 MONITOR'])
+    return (
+        f"<div style='padding: 16px; border-radius: 8px; border-left: 6px solid {border_color}; "
+        f"background-color: {bg_color}; margin: 12px 0; border: 1px solid {border_color}40; "
+        f"box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>"
+        f"<div style='display: flex; align-items: center; margin-bottom: 8px;'>"
+        f"<span style='font-size: 20px; margin-right: 8px;'>{icon}</span>"
+        f"<h4 style='margin: 0; color: {text_color}; font-weight: bold;'>{insight.type}: {insight.title}</h4>"
+        f"</div>"
+        f"<p style='margin: 8px 0; font-size: 16px; font-weight: 600; color: #333;'>{insight.message}</p>"
+        f"<div style='display: flex; align-items: center; margin-top: 12px; padding: 8px; "
+        f"background-color: rgba(255,255,255,0.7); border-radius: 4px;'>"
+        f"<span style='font-size: 18px; margin-right: 8px;'>💡</span>"
+        f"<p style='margin: 0; font-style: normal; font-weight: 500; color: #555;'>"
+        f"<strong>Recommendation:</strong> {insight.recommendation}</p>"
+        f"</div></div>"
+    )
+
+def stream_lines(text):
+    """Yield a chat response a line at a time for st.write_stream"""
+    for line in text.splitlines(keepends=True):
+        yield line
+
+chatbot = get_chatbot()
+analytics_engine = get_analytics_engine()
+
+# Chat messages kept (and re-rendered) per session; older ones are dropped.
+# Deployments can raise or lower the cap with the AHD_CHAT_HISTORY variable
+DEFAULT_CHAT_HISTORY = 40
+
+def chat_history_limit():
+    """Chat history cap from AHD_CHAT_HISTORY, or the default if unset or invalid"""
+    value = os.environ.get("AHD_CHAT_HISTORY", "").strip()
+    if not value:
+        return DEFAULT_CHAT_HISTORY
+    try:
+        return max(1, int(value))
+    except ValueError:
+        st.warning(f"⚠️ Ignoring invalid AHD_CHAT_HISTORY={value!r}; keeping the last "
+                   f"{DEFAULT_CHAT_HISTORY} chat messages")
+        return DEFAULT_CHAT_HISTORY
+
+MAX_CHAT_HISTORY = chat_history_limit()
+CHAT_WELCOME = "Hello! I'm your HIV/AIDS expert assistant. I can help with treatment guidelines, prevention strategies, clinical management, mental health integration, myths clarification, and much more. What would you like to know?"
+
+# Quick Access buttons as (label, prompt), one tuple per column; each prompt
+# is a key of chatbot.quick_responses, so a click is a dict lookup
+QUICK_TOPICS = (
+    (("📊 Kenya Statistics", "HIV statistics Kenya 2025"),
+     ("💊 ART Regimens", "first line ART regimens"),
+     ("🩺 NCDs & HIV", "HIV and NCDs")),
+    (("🛡️ Prevention", "HIV prevention methods"),
+     ("🤰 PMTCT", "PMTCT guidelines"),
+     ("🦠 TB-HIV", "TB HIV coinfection")),
+    (("🏥 WHO Staging", "WHO clinical staging"),
+     ("❌ Myths & Facts", "HIV myths and misconceptions"),
+     ("🧠 Mental Health", "mental health and HIV")),
+)
+
+def new_chat_history():
+    """Fresh bounded chat history holding only the welcome message"""
+    return deque([{"role": "assistant", "content": CHAT_WELCOME}], maxlen=MAX_CHAT_HISTORY)
+
+# Button callbacks: they update the history before the chat fragment reruns,
+# so that single rerun already draws the new turns
+def ask_quick_topic(topic):
+    """Add a Quick Access prompt and its prebuilt answer to the chat"""
+    st.session_state.messages.append({"role": "user", "content": topic})
+    st.session_state.messages.append({"role": "assistant", "content": get_chatbot().quick_responses[topic]})
+
+def clear_chat():
+    """Reset the chat to just the welcome message"""
+    st.session_state.messages = new_chat_history()
 
 # -------------------------------
 # CREATE TABS
@@ -903,58 +605,34 @@ with tab1:
         cd4 = st.sidebar.number_input("Latest CD4 Count", min_value=0, max_value=2000, value=350)
         vl = st.sidebar.number_input("Latest Viral Load (copies/ml)", min_value=0, max_value=10000000, value=1000)
         months_rx = st.sidebar.slider("Months of Prescription", 0, 6, 3)
-        who_stage = st.sidebar.selectbox("Last WHO Stage", [1, 2, 3, 4])
-        cd4_risk = st.sidebar.selectbox("CD4 Risk Category", ["Severe", "Moderate", "Normal", "Unknown"])
-        sex = st.sidebar.selectbox("Sex", ["Female", "Male"])
+        who_stage = st.sidebar.selectbox("Last WHO Stage", WHO_STAGE_OPTIONS)
+        cd4_risk = st.sidebar.selectbox("CD4 Risk Category", CD4_RISK_OPTIONS)
+        sex = st.sidebar.selectbox("Sex", SEX_OPTIONS)
         st.sidebar.markdown("---")
 
-        # Derived features
-        bmi = weight / ((height / 100) ** 2) if height > 0 else 0
-        cd4_missing = 0 if cd4 > 0 else 1
-        vl_missing = 0 if vl > 0 else 1
-        vl_suppressed = 1 if vl < 1000 else 0
-
-        cd4_risk_Severe = 1 if cd4_risk == "Severe" else 0
-        cd4_risk_Moderate = 1 if cd4_risk == "Moderate" else 0
-        cd4_risk_Normal = 1 if cd4_risk == "Normal" else 0
-
-        Last_WHO_Stage_2 = 1 if who_stage == 2 else 0
-        Last_WHO_Stage_3 = 1 if who_stage == 3 else 0
-        Last_WHO_Stage_4 = 1 if who_stage == 4 else 0
-        Sex_M = 1 if sex.lower().startswith("m") else 0
-
-        Active_in_PMTCT_Missing = 0
-        Cacx_Screening_Missing = 0
-        Refill_Date_Missing = 0
-
-        input_data_dict = {
-            'Age at reporting': age,
-            'Weight': weight,
-            'Height': height,
-            'BMI': bmi,
-            'Latest CD4 Result': cd4,
-            'CD4_Missing': cd4_missing,
-            'Last VL Result': vl,
-            'VL_Suppressed': vl_suppressed,
-            'VL_Missing': vl_missing,
-            'Months of Prescription': months_rx,
-            'cd4_risk_Moderate': cd4_risk_Moderate,
-            'cd4_risk_Normal': cd4_risk_Normal,
-            'cd4_risk_Severe': cd4_risk_Severe,
-            'Last_WHO_Stage_2': Last_WHO_Stage_2,
-            'Last_WHO_Stage_3': Last_WHO_Stage_3,
-            'Last_WHO_Stage_4': Last_WHO_Stage_4,
-            'Active_in_PMTCT_Missing': Active_in_PMTCT_Missing,
-            'Cacx_Screening_Missing': Cacx_Screening_Missing,
-            'Refill_Date_Missing': Refill_Date_Missing,
-            'Sex_M': Sex_M
-        }
-
-        X_input = pd.DataFrame([input_data_dict])[feature_names].astype(float)
+        input_data_dict = derive_features(age, weight, height, cd4, vl, months_rx, who_stage, cd4_risk, sex)
+        bmi = input_data_dict['BMI']
 
         if st.sidebar.button("🔍 Predict AHD Risk", type="primary"):
-            pred = model.predict(X_input)[0]
-            proba = model.predict_proba(X_input)[0][1]
+            # Single row in the model's feature order, which load_model checked
+            # against the columns the model was fitted on. float32 is what the
+            # forest's trees compare against, so sklearn's validation passes it
+            # through without a converting copy. Built per click rather than
+            # into a shared buffer, since sessions run on separate threads
+            X_row = np.fromiter(feature_getter(input_data_dict), dtype=np.float32,
+                                count=len(feature_names)).reshape(1, -1)
+            # Named columns, as the model was fitted with; copy=False wraps the
+            # row in place rather than copying it
+            X_input = pd.DataFrame(X_row, columns=feature_names, copy=False)
+            # One forward pass: the label is the argmax of the probabilities,
+            # exactly what CalibratedClassifierCV.predict computes internally.
+            # Every input comes from a bounded widget, so sklearn's NaN/inf scan
+            # of the row is skipped (sklearn is already loaded with the model)
+            from sklearn import config_context
+            with config_context(assume_finite=True):
+                proba_row = model.predict_proba(X_input)[0]
+            proba = proba_row[1]
+            pred = model.classes_[proba_row.argmax()]
 
             col1, col2 = st.columns(2)
             with col1:
@@ -980,31 +658,114 @@ with tab1:
             features_df = pd.DataFrame({
                 'Feature': list(input_data_dict.keys()),
                 'Value': list(input_data_dict.values()),
-                'Clinical Significance': [
-                    'Demographic factor' if 'Age' in k or 'Sex' in k else
-                    'Nutritional indicator' if 'Weight' in k or 'Height' in k or 'BMI' in k else
-                    'Critical immunologic marker' if 'CD4' in k else
-                    'Virologic marker' if 'VL' in k else
-                    'Treatment adherence indicator' if 'Months' in k else
-                    'Disease severity indicator' if 'WHO' in k else
-                    'Risk stratification' if 'risk' in k else
-                    'Data quality indicator' if 'Missing' in k else 'Other'
-                    for k in input_data_dict.keys()
-                ]
+                'Clinical Significance': [FEATURE_SIGNIFICANCE.get(k, 'Other') for k in input_data_dict]
             })
             
             with st.expander("📊 Detailed Feature Analysis", expanded=True):
                 st.dataframe(features_df, use_container_width=True, hide_index=True)
                 
-                st.markdown("**🔍 Key Feature Insights:**")
-                if cd4 < 200:
-                    st.markdown(f"- **CD4 {cd4}**: Below AHD threshold (<200 cells/mm³)")
-                if vl > 1000:
-                    st.markdown(f"- **Viral Load {vl:,}**: Unsuppressed (≥1000 copies/mL)")
-                if bmi < 18.5:
-                    st.markdown(f"- **BMI {bmi:.1f}**: Underweight, consider nutritional support")
+                # Built up and sent as one markdown element rather than one per line
+                key_insights = ["**🔍 Key Feature Insights:**\n"]
+                if cd4 < CD4_AHD_THRESHOLD:
+                    key_insights.append(f"- **CD4 {cd4}**: Below AHD threshold (<200 cells/mm³)")
+                if vl > VL_SUPPRESSION_THRESHOLD:
+                    key_insights.append(f"- **Viral Load {vl:,}**: Unsuppressed (≥1000 copies/mL)")
+                if bmi < BMI_UNDERWEIGHT:
+                    key_insights.append(f"- **BMI {bmi:.1f}**: Underweight, consider nutritional support")
                 if who_stage in [3, 4]:
-                    st.markdown(f"- **WHO Stage {who_stage}**: Advanced disease presentation")
+                    key_insights.append(f"- **WHO Stage {who_stage}**: Advanced disease presentation")
+                st.markdown("\n".join(key_insights))
+
+        # Batch scoring: every uploaded patient goes through one predict_proba call
+        st.markdown("---")
+        with st.expander("📂 Batch Risk Scoring (CSV)"):
+            batch_file = st.file_uploader(
+                "Upload CSV with one row per patient",
+                type=['csv'],
+                key="batch_scoring",
+                help="File should contain: " + ", ".join(RAW_INPUT_COLUMNS) +
+                     " (CD4_Risk as Severe/Moderate/Normal/Unknown, Sex as Male/Female)"
+            )
+            batch = None
+            if batch_file is not None:
+                # Empty, non-CSV or malformed files are reported here rather
+                # than aborting the script run (and with it the other tabs)
+                try:
+                    batch = read_clinic_csv(batch_file.getvalue())
+                except ValueError as e:
+                    st.error(f"❌ Could not read the CSV file: {e}")
+            if batch is not None:
+                missing_columns = [name for name in RAW_INPUT_COLUMNS if name not in batch.columns]
+                if missing_columns:
+                    st.error(f"❌ Missing columns: {', '.join(missing_columns)}")
+                else:
+                    # Text such as "N/A" becomes NaN; any row without finite
+                    # numbers is reported and left out of scoring
+                    raw = batch[list(RAW_NUMERIC_COLUMNS)].apply(pd.to_numeric, errors='coerce')
+                    raw['CD4_Risk'] = batch['CD4_Risk']
+                    raw['Sex'] = batch['Sex']
+                    all_features = derive_batch_features(raw)
+                    # Screened after the float32 cast the model sees, so values
+                    # beyond float32's range (which cast to inf) are caught too
+                    with np.errstate(over='ignore'):
+                        X_all = all_features[list(feature_names)].to_numpy(dtype=np.float32)
+                    valid = (np.isfinite(raw[list(RAW_NUMERIC_COLUMNS)].to_numpy(dtype=float)).all(axis=1)
+                             & np.isfinite(X_all).all(axis=1))
+                    if not valid.all():
+                        # CSV line numbers, counting the header as line 1
+                        bad_lines = np.flatnonzero(~valid) + 2
+                        shown = ", ".join(map(str, bad_lines[:10])) + (", ..." if len(bad_lines) > 10 else "")
+                        st.warning(f"⚠️ Skipped {len(bad_lines)} row(s) with missing, non-numeric or out-of-range "
+                                   f"values (CSV lines {shown})")
+                    if not valid.any():
+                        st.error("❌ No rows with complete numeric values to score")
+                    else:
+                        batch_features = all_features[valid]
+                        # One blank cell makes pd.to_numeric return floats for the
+                        # whole column; with those rows dropped, whole-number
+                        # columns go back to integers so counts read as 150, not 150.0
+                        integral = [name for name, values in batch_features.select_dtypes('float').items()
+                                    if ((values % 1 == 0) & (values.abs() < 2 ** 53)).all()]
+                        batch_features = batch_features.astype(dict.fromkeys(integral, 'int64'))
+                        # Named float32 columns in the order load_model checked;
+                        # sklearn's own input validation stays on for file data
+                        X_batch = X_all[valid]
+                        proba_batch = model.predict_proba(pd.DataFrame(X_batch, columns=feature_names, copy=False))
+                        pred_batch = model.classes_[proba_batch.argmax(axis=1)]
+                        results = pd.DataFrame({
+                            'AHD Risk': np.where(pred_batch == 1, 'High Risk', 'Low Risk'),
+                            'Risk Probability': proba_batch[:, 1],
+                        })
+                        if 'Patient_ID' in batch.columns:
+                            results.insert(0, 'Patient_ID', batch['Patient_ID'].to_numpy()[valid])
+                        
+                        high_risk = (pred_batch == 1).sum()
+                        st.success(f"✅ Scored {len(results)} patients: {high_risk} high risk ({high_risk / len(results):.1%})")
+                        st.dataframe(
+                            results, use_container_width=True, hide_index=True,
+                            column_config={'Risk Probability': st.column_config.ProgressColumn(
+                                'Risk Probability', format='percent', min_value=0.0, max_value=1.0
+                            )}
+                        )
+                        st.download_button(
+                            label="📊 Download Risk Scores (CSV)",
+                            data=csv_bytes(results),
+                            file_name="ahd_risk_scores.csv",
+                            mime="text/csv",
+                            on_click="ignore"
+                        )
+
+                        # Only the selected patient is interpreted on each rerun
+                        labels = (results['Patient_ID'].astype(str).tolist() if 'Patient_ID' in results.columns
+                                  else [f"Row {line}" for line in np.flatnonzero(valid) + 2])
+                        patient = st.selectbox("🔎 Interpret a patient", range(len(labels)),
+                                               format_func=labels.__getitem__, key="batch_patient")
+                        # A one-row slice keeps each column's dtype, where .iloc[i]
+                        # would upcast the whole row to float
+                        st.markdown(chatbot.interpret_prediction(
+                            pred_batch[patient], proba_batch[patient, 1],
+                            batch_features.iloc[[patient]].to_dict('records')[0]
+                        ))
 
 # -------------------------------
 # TAB 2: Enhanced Analytics Dashboard
@@ -1039,13 +800,13 @@ with tab2:
     data_source = None
     
     if uploaded_file is not None:
-        current_data = pd.read_csv(uploaded_file)
+        current_data = read_clinic_csv(uploaded_file.getvalue())
         data_source = "Uploaded File"
         st.success(f"✅ Successfully loaded {len(current_data)} patient records")
         
     elif demo_option != "Select sample...":
         clinic_type = "urban" if "Urban" in demo_option else "rural"
-        current_data = analytics_engine.generate_sample_data(clinic_type)
+        current_data = load_sample_data(clinic_type)
         data_source = demo_option
         st.success(f"✅ Generated {len(current_data)} sample patient records from {demo_option}")
     
@@ -1055,8 +816,19 @@ with tab2:
         
         # Perform analysis
         with st.spinner("🔍 Analyzing clinic data..."):
-            analysis = analytics_engine.analyze_clinic_data(current_data)
-            insights = analytics_engine.generate_insights(analysis, current_data)
+            analysis, insights = analyze_clinic(current_data)
+        
+        # One timestamp for the whole analysis, so the explorer, report and
+        # download names all agree
+        now = datetime.now()
+        
+        # Columns behind the insight counts, pulled out once as plain arrays
+        n_patients = len(current_data)
+        cd4_values = current_data['CD4_Count'].to_numpy()
+        vl_values = current_data['Viral_Load'].to_numpy()
+        age_values = current_data['Age'].to_numpy()
+        art_months = current_data['Months_on_ART'].to_numpy()
+        missed_visits = current_data['Missed_Visits'].to_numpy()
         
         # Key Metrics Dashboard
         st.markdown("### 📈 Key Performance Indicators")
@@ -1102,50 +874,8 @@ with tab2:
         st.markdown("### 💡 Smart Insights & Recommendations")
         
         if insights:
-            for insight in insights:
-                # Use different background colors and better styling based on severity
-                if 'CRITICAL' in insight['type']:
-                    bg_color = '#ffebee'  # Light red background
-                    border_color = '#d32f2f'  # Dark red border
-                    text_color = '#b71c1c'  # Dark red text
-                    icon = '🚨'
-                elif 'WARNING' in insight['type']:
-                    bg_color = '#fff3e0'  # Light orange background
-                    border_color = '#f57c00'  # Orange border
-                    text_color = '#e65100'  # Dark orange text
-                    icon = '⚠️'
-                elif 'TARGETED' in insight['type']:
-                    bg_color = '#e8f5e8'  # Light green background
-                    border_color = '#388e3c'  # Green border
-                    text_color = '#1b5e20'  # Dark green text
-                    icon = '🎯'
-                else:  # MONITOR
-                    bg_color = '#e3f2fd'  # Light blue background
-                    border_color = '#1976d2'  # Blue border
-                    text_color = '#0d47a1'  # Dark blue text
-                    icon = '📊'
-                
-                st.markdown(f"""
-                <div style='
-                    padding: 16px; 
-                    border-radius: 8px; 
-                    border-left: 6px solid {border_color}; 
-                    background-color: {bg_color}; 
-                    margin: 12px 0;
-                    border: 1px solid {border_color}40;
-                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                '>
-                <div style='display: flex; align-items: center; margin-bottom: 8px;'>
-                    <span style='font-size: 20px; margin-right: 8px;'>{icon}</span>
-                    <h4 style='margin: 0; color: {text_color}; font-weight: bold;'>{insight['type']}: {insight['title']}</h4>
-                </div>
-                <p style='margin: 8px 0; font-size: 16px; font-weight: 600; color: #333;'>{insight['message']}</p>
-                <div style='display: flex; align-items: center; margin-top: 12px; padding: 8px; background-color: rgba(255,255,255,0.7); border-radius: 4px;'>
-                    <span style='font-size: 18px; margin-right: 8px;'>💡</span>
-                    <p style='margin: 0; font-style: normal; font-weight: 500; color: #555;'><strong>Recommendation:</strong> {insight['recommendation']}</p>
-                </div>
-                </div>
-                """, unsafe_allow_html=True)
+            # All cards go to the browser as a single markdown element
+            st.markdown("".join(insight_card(insight) for insight in insights), unsafe_allow_html=True)
         else:
             st.success("🎉 Excellent! Your clinic is meeting or exceeding most performance targets!")
         
@@ -1159,33 +889,22 @@ with tab2:
             
             with col1:
                 st.write("**CD4 Count Distribution**")
-                fig, ax = plt.subplots(figsize=(10, 6))
                 
                 # Create CD4 categories
-                cd4_bins = [0, 200, 350, 500, float('inf')]
+                cd4_edges = (CD4_AHD_THRESHOLD, CD4_LOW_THRESHOLD, 500)
                 cd4_labels = ['Critical (<200)', 'Advanced (200-350)', 'Good (350-500)', 'Excellent (>500)']
-                current_data['CD4_Category'] = pd.cut(current_data['CD4_Count'], bins=cd4_bins, labels=cd4_labels)
+                cd4_codes, cd4_counts = band_codes(cd4_values, cd4_edges)
+                current_data['CD4_Category'] = pd.Categorical.from_codes(cd4_codes, categories=cd4_labels)
                 
-                cd4_counts = current_data['CD4_Category'].value_counts().reindex(cd4_labels)
                 colors = ['#ff4444', '#ffaa00', '#66bb6a', '#2e7d32']
                 
-                bars = ax.bar(cd4_labels, cd4_counts.values, color=colors, alpha=0.8, edgecolor='black', linewidth=0.5)
-                ax.set_ylabel('Number of Patients', fontweight='bold')
-                ax.set_title('CD4 Health Distribution', fontweight='bold', fontsize=14)
-                plt.xticks(rotation=45, ha='right')
-                ax.grid(axis='y', alpha=0.3)
-                
-                # Add value labels
-                for bar, count in zip(bars, cd4_counts.values):
-                    ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5,
-                           f'{count}', ha='center', va='bottom', fontweight='bold', fontsize=10)
-                
-                st.pyplot(fig)
+                st.altair_chart(category_bar_chart(cd4_labels, cd4_counts, colors, 'CD4 Health Distribution'),
+                                use_container_width=True)
                 
                 # CD4 insights
                 with st.expander("📋 CD4 Insights"):
-                    critical_pct = (current_data['CD4_Count'] < 200).mean() * 100
-                    excellent_pct = (current_data['CD4_Count'] >= 500).mean() * 100
+                    critical_pct = (cd4_values < CD4_AHD_THRESHOLD).mean() * 100
+                    excellent_pct = (cd4_values >= 500).mean() * 100
                     st.write(f"""
                     - **Critical CD4 (<200)**: {critical_pct:.1f}% of patients
                     - **Excellent CD4 (≥500)**: {excellent_pct:.1f}% of patients  
@@ -1195,28 +914,17 @@ with tab2:
             
             with col2:
                 st.write("**Viral Load Status**")
-                fig, ax = plt.subplots(figsize=(10, 6))
                 
                 # Create VL categories
-                vl_bins = [0, 50, 1000, 10000, float('inf')]
+                vl_edges = (50, VL_SUPPRESSION_THRESHOLD, 10000)
                 vl_labels = ['Undetectable (<50)', 'Suppressed (50-1000)', 'Unsuppressed (1000-10000)', 'High (>10000)']
-                current_data['VL_Category'] = pd.cut(current_data['Viral_Load'], bins=vl_bins, labels=vl_labels)
+                vl_codes, vl_counts = band_codes(vl_values, vl_edges)
+                current_data['VL_Category'] = pd.Categorical.from_codes(vl_codes, categories=vl_labels)
                 
-                vl_counts = current_data['VL_Category'].value_counts().reindex(vl_labels)
                 colors = ['#2e7d32', '#66bb6a', '#ffaa00', '#ff4444']
                 
-                bars = ax.bar(vl_labels, vl_counts.values, color=colors, alpha=0.8, edgecolor='black', linewidth=0.5)
-                ax.set_ylabel('Number of Patients', fontweight='bold')
-                ax.set_title('Viral Load Control', fontweight='bold', fontsize=14)
-                plt.xticks(rotation=45, ha='right')
-                ax.grid(axis='y', alpha=0.3)
-                
-                # Add value labels
-                for bar, count in zip(bars, vl_counts.values):
-                    ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5,
-                           f'{count}', ha='center', va='bottom', fontweight='bold', fontsize=10)
-                
-                st.pyplot(fig)
+                st.altair_chart(category_bar_chart(vl_labels, vl_counts, colors, 'Viral Load Control'),
+                                use_container_width=True)
                 
                 # VL insights
                 with st.expander("📋 Viral Load Insights"):
@@ -1234,50 +942,33 @@ with tab2:
             
             with col1:
                 st.write("**Age Distribution**")
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.hist(current_data['Age'], bins=15, alpha=0.7, color='#2196f3', edgecolor='black')
-                ax.set_xlabel('Age (years)')
-                ax.set_ylabel('Number of Patients')
-                ax.set_title('Patient Age Distribution', fontweight='bold')
-                ax.axvline(current_data['Age'].mean(), color='red', linestyle='--', linewidth=2, 
-                          label=f"Mean: {current_data['Age'].mean():.1f} years")
-                ax.legend()
-                ax.grid(alpha=0.3)
-                st.pyplot(fig)
+                st.altair_chart(histogram_chart(current_data['Age'], 15, '#2196f3', 'Age (years)',
+                                                'Patient Age Distribution', 'years'), use_container_width=True)
                 
                 # Age insights
                 with st.expander("📋 Age Insights"):
-                    young_patients = current_data[current_data['Age'] < 25]
-                    older_patients = current_data[current_data['Age'] > 50]
+                    young_patients = (age_values < 25).sum()
+                    older_patients = (age_values > 50).sum()
                     st.write(f"""
-                    - **Young patients (18-25)**: {len(young_patients)} patients ({len(young_patients)/len(current_data)*100:.1f}%)
-                    - **Older patients (50+)**: {len(older_patients)} patients ({len(older_patients)/len(current_data)*100:.1f}%)
-                    - **Average age**: {current_data['Age'].mean():.1f} years
-                    - **Age range**: {current_data['Age'].min()} - {current_data['Age'].max()} years
+                    - **Young patients (18-25)**: {young_patients} patients ({young_patients/n_patients*100:.1f}%)
+                    - **Older patients (50+)**: {older_patients} patients ({older_patients/n_patients*100:.1f}%)
+                    - **Average age**: {analysis['avg_age']:.1f} years
+                    - **Age range**: {np.nanmin(age_values)} - {np.nanmax(age_values)} years
                     """)
             
             with col2:
                 st.write("**Gender Distribution**")
                 gender_counts = current_data['Gender'].value_counts()
-                fig, ax = plt.subplots(figsize=(8, 6))
-                colors = ['#64b5f6', '#f06292']  # Blue for Male, Pink for Female
-                wedges, texts, autotexts = ax.pie(gender_counts.values, labels=gender_counts.index, autopct='%1.1f%%', 
-                      colors=colors, startangle=90)
-                ax.set_title('Patient Gender Distribution', fontweight='bold')
-                
-                # Improve autopct styling
-                for autotext in autotexts:
-                    autotext.set_color('white')
-                    autotext.set_fontweight('bold')
-                    autotext.set_fontsize(10)
-                
-                st.pyplot(fig)
+                colors = ('#64b5f6', '#f06292')  # Blue for Male, Pink for Female
+                st.altair_chart(pie_chart(gender_counts, 'Patient Gender Distribution', colors, text_color='white'),
+                                use_container_width=True)
                 
                 # Gender insights
                 with st.expander("📋 Gender Insights"):
-                    for gender, count in gender_counts.items():
-                        pct = count / len(current_data) * 100
-                        st.write(f"- **{gender}**: {count} patients ({pct:.1f}%)")
+                    st.markdown("\n".join(
+                        f"- **{gender}**: {count} patients ({count / n_patients * 100:.1f}%)"
+                        for gender, count in gender_counts.items()
+                    ))
         
         with tab_analytics3:
             col1, col2 = st.columns(2)
@@ -1285,48 +976,29 @@ with tab2:
             with col1:
                 st.write("**ART Regimen Distribution**")
                 regimen_counts = current_data['ART_Regimen'].value_counts()
-                fig, ax = plt.subplots(figsize=(10, 6))
-                colors = plt.cm.Set3(np.linspace(0, 1, len(regimen_counts)))
-                wedges, texts, autotexts = ax.pie(regimen_counts.values, labels=regimen_counts.index, autopct='%1.1f%%', 
-                                                 startangle=90, colors=colors)
-                ax.set_title('ART Regimen Usage', fontweight='bold')
-                
-                # Improve autopct styling
-                for autotext in autotexts:
-                    autotext.set_color('black')
-                    autotext.set_fontweight('bold')
-                
-                st.pyplot(fig)
+                st.altair_chart(pie_chart(regimen_counts, 'ART Regimen Usage'), use_container_width=True)
                 
                 # Regimen insights
                 with st.expander("📋 Regimen Insights"):
-                    st.write("**Most Common Regimens:**")
-                    for regimen, count in regimen_counts.head(3).items():
-                        pct = count / len(current_data) * 100
-                        st.write(f"- {regimen}: {pct:.1f}%")
+                    st.markdown("\n".join(
+                        ["**Most Common Regimens:**\n"] +
+                        [f"- {regimen}: {count / n_patients * 100:.1f}%" for regimen, count in regimen_counts.head(3).items()]
+                    ))
             
             with col2:
                 st.write("**Treatment Duration**")
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.hist(current_data['Months_on_ART'], bins=20, alpha=0.7, color='#4caf50', edgecolor='black')
-                ax.set_xlabel('Months on ART')
-                ax.set_ylabel('Number of Patients')
-                ax.set_title('Treatment Duration Distribution', fontweight='bold')
-                ax.axvline(current_data['Months_on_ART'].mean(), color='red', linestyle='--', linewidth=2,
-                          label=f"Mean: {current_data['Months_on_ART'].mean():.1f} months")
-                ax.legend()
-                ax.grid(alpha=0.3)
-                st.pyplot(fig)
+                st.altair_chart(histogram_chart(current_data['Months_on_ART'], 20, '#4caf50', 'Months on ART',
+                                                'Treatment Duration Distribution', 'months'), use_container_width=True)
                 
                 # Treatment duration insights
                 with st.expander("📋 Treatment Duration Insights"):
-                    new_patients = (current_data['Months_on_ART'] < 6).sum()
-                    experienced_patients = (current_data['Months_on_ART'] >= 12).sum()
+                    new_patients = (art_months < 6).sum()
+                    experienced_patients = (art_months >= 12).sum()
                     st.write(f"""
-                    - **New patients (<6 months)**: {new_patients} ({new_patients/len(current_data)*100:.1f}%)
-                    - **Experienced (≥12 months)**: {experienced_patients} ({experienced_patients/len(current_data)*100:.1f}%)
-                    - **Average duration**: {current_data['Months_on_ART'].mean():.1f} months
-                    - **Longest duration**: {current_data['Months_on_ART'].max()} months
+                    - **New patients (<6 months)**: {new_patients} ({new_patients/n_patients*100:.1f}%)
+                    - **Experienced (≥12 months)**: {experienced_patients} ({experienced_patients/n_patients*100:.1f}%)
+                    - **Average duration**: {analysis['avg_art_duration']:.1f} months
+                    - **Longest duration**: {np.nanmax(art_months)} months
                     """)
         
         with tab_analytics4:
@@ -1337,14 +1009,14 @@ with tab2:
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Total Patients", len(current_data))
+                st.metric("Total Patients", n_patients)
             with col2:
                 st.metric("Data Columns", len(current_data.columns))
             with col3:
-                completeness = 100 - (current_data.isnull().sum().sum() / (len(current_data) * len(current_data.columns)) * 100)
+                completeness = 100 - (current_data.isnull().sum().sum() / (n_patients * len(current_data.columns)) * 100)
                 st.metric("Data Completeness", f"{completeness:.1f}%")
             with col4:
-                st.metric("Analysis Date", datetime.now().strftime('%Y-%m-%d'))
+                st.metric("Analysis Date", f"{now:%Y-%m-%d}")
             
             # Interactive dataframe
             st.dataframe(current_data, use_container_width=True, height=400)
@@ -1354,9 +1026,10 @@ with tab2:
                 missing_data = current_data.isnull().sum()
                 if missing_data.sum() > 0:
                     st.warning("⚠️ **Missing Data Detected:**")
-                    for col, missing_count in missing_data[missing_data > 0].items():
-                        missing_pct = (missing_count / len(current_data)) * 100
-                        st.write(f"- {col}: {missing_count} missing values ({missing_pct:.1f}%)")
+                    st.markdown("\n".join(
+                        f"- {col}: {missing_count} missing values ({missing_count / n_patients * 100:.1f}%)"
+                        for col, missing_count in missing_data[missing_data > 0].items()
+                    ))
                 else:
                     st.success("✅ **Excellent Data Quality**: No missing values detected")
         
@@ -1364,13 +1037,14 @@ with tab2:
         st.markdown("---")
         st.markdown("### 📥 Export Analysis Report")
         
-        # Generate comprehensive report with action plan
-        report_text = f"""
+        # Generate comprehensive report with action plan; assembled from parts
+        # and joined once rather than grown with += per insight
+        report_header = f"""
 COMPREHENSIVE CLINIC PERFORMANCE ANALYSIS REPORT
 ================================================
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}
+Generated: {now:%Y-%m-%d %H:%M}
 Data Source: {data_source}
-Total Patients Analyzed: {len(current_data)}
+Total Patients Analyzed: {n_patients}
 
 KEY PERFORMANCE INDICATORS:
 ---------------------------
@@ -1381,10 +1055,10 @@ KEY PERFORMANCE INDICATORS:
 
 CLINICAL INSIGHTS:
 ------------------
-• Total patients with critical CD4 (<200): {(current_data['CD4_Count'] < 200).sum()}
-• Patients with undetectable viral load: {(current_data['Viral_Load'] < 50).sum()}
+• Total patients with critical CD4 (<200): {(cd4_values < CD4_AHD_THRESHOLD).sum()}
+• Patients with undetectable viral load: {(vl_values < 50).sum()}
 • Average treatment duration: {analysis['avg_art_duration']:.1f} months
-• Patients with poor retention: {(current_data['Missed_Visits'] > 2).sum()}
+• Patients with poor retention: {(missed_visits > 2).sum()}
 
 COMPREHENSIVE ACTION PLAN:
 ==========================
@@ -1393,12 +1067,14 @@ PRIORITY RECOMMENDATIONS:
 -------------------------
 """
         
-        for i, insight in enumerate(insights, 1):
-            report_text += f"\n{i}. {insight['type']}: {insight['title']}"
-            report_text += f"\n   - Issue: {insight['message']}"
-            report_text += f"\n   - Recommendation: {insight['recommendation']}\n"
+        report_actions = [
+            f"\n{i}. {insight.type}: {insight.title}"
+            f"\n   - Issue: {insight.message}"
+            f"\n   - Recommendation: {insight.recommendation}\n"
+            for i, insight in enumerate(insights, 1)
+        ]
         
-        report_text += f"""
+        report_footer = f"""
 
 IMPLEMENTATION TIMELINE:
 ------------------------
@@ -1409,34 +1085,37 @@ IMPLEMENTATION TIMELINE:
 
 DATA QUALITY SUMMARY:
 ---------------------
-• Total records: {len(current_data)}
+• Total records: {n_patients}
 • Data completeness: {completeness:.1f}%
-• Analysis period: Up to {datetime.now().strftime('%B %Y')}
+• Analysis period: Up to {now:%B %Y}
 
 ---
 Report generated by AHD Copilot Analytics Dashboard
 For clinical decision support and quality improvement planning
 """
+        report_text = "".join([report_header, *report_actions, report_footer])
         
         col1, col2 = st.columns(2)
         
         with col1:
             st.download_button(
                 label="📄 Download Comprehensive Report",
-                data=report_text,
-                file_name=f"clinic_comprehensive_report_{datetime.now().strftime('%Y%m%d_%H%M')}.txt",
+                data=report_text.encode("utf-8"),
+                file_name=f"clinic_comprehensive_report_{now:%Y%m%d_%H%M}.txt",
                 mime="text/plain",
+                on_click="ignore",
                 use_container_width=True
             )
         
         with col2:
-            # Convert DataFrame to CSV for download
-            csv = current_data.to_csv(index=False)
+            # Serialised once per dataset; later reruns reuse the cached bytes
+            csv = csv_bytes(current_data)
             st.download_button(
                 label="📊 Download Raw Data (CSV)",
                 data=csv,
-                file_name=f"clinic_analysis_data_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+                file_name=f"clinic_analysis_data_{now:%Y%m%d_%H%M}.csv",
                 mime="text/csv",
+                on_click="ignore",
                 use_container_width=True
             )
     
@@ -1461,15 +1140,16 @@ For clinical decision support and quality improvement planning
 # -------------------------------
 # TAB 3: ENHANCED HIV EXPERT CHATBOT
 # -------------------------------
-with tab3:
+# A fragment, so chatting and the Quick Access buttons rerun only this tab
+# instead of the prediction dashboard and clinic analytics as well
+@st.fragment
+def chat_tab():
     st.subheader("💬 HIV/AIDS Expert Chatbot")
     st.info("🔬 **Your comprehensive HIV clinical decision support assistant**")
     
     # Initialize chat history
     if "messages" not in st.session_state:
-        st.session_state.messages = [
-            {"role": "assistant", "content": "Hello! I'm your HIV/AIDS expert assistant. I can help with treatment guidelines, prevention strategies, clinical management, mental health integration, myths clarification, and much more. What would you like to know?"}
-        ]
+        st.session_state.messages = new_chat_history()
     
     # Display chat messages
     for message in st.session_state.messages:
@@ -1478,17 +1158,18 @@ with tab3:
     
     # Chat input at the top for better UX
     if prompt := st.chat_input("Ask any HIV-related question in your own words..."):
-        # Add user message to chat history
+        # Add user message to chat history. The history above was drawn before
+        # it existed, so render just this new turn below it instead of
+        # rerunning the script to redraw everything
         st.session_state.messages.append({"role": "user", "content": prompt})
+        with st.chat_message("user"):
+            st.markdown(prompt)
         
         # Generate assistant response
         with st.chat_message("assistant"):
-            message_placeholder = st.empty()
-            message_placeholder.markdown("Thinking...")
-            
-            # Get response from expert chatbot
+            # Get response from expert chatbot and stream it line by line
             response = chatbot.get_response(prompt)
-            message_placeholder.markdown(response)
+            st.write_stream(stream_lines(response))
             
             # Add assistant response to chat history
             st.session_state.messages.append({"role": "assistant", "content": response})
@@ -1497,63 +1178,18 @@ with tab3:
     st.markdown("---")
     st.markdown("### 💡 Quick Access Topics")
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        if st.button("📊 Kenya Statistics", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "HIV statistics Kenya 2025"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot.get_statistics("kenya")})
-            st.rerun()
-        
-        if st.button("💊 ART Regimens", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "first line ART regimens"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot.get_treatment_info("first_line")})
-            st.rerun()
-        
-        if st.button("🩺 NCDs & HIV", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "HIV and NCDs"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot.get_ncd_info()})
-            st.rerun()
-    
-    with col2:
-        if st.button("🛡️ Prevention", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "HIV prevention methods"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot._get_prevention_info()})
-            st.rerun()
-        
-        if st.button("🤰 PMTCT", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "PMTCT guidelines"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot._get_pmtct_info()})
-            st.rerun()
-        
-        if st.button("🦠 TB-HIV", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "TB HIV coinfection"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot._get_tb_hiv_info()})
-            st.rerun()
-    
-    with col3:
-        if st.button("🏥 WHO Staging", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "WHO clinical staging"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot._get_who_staging()})
-            st.rerun()
-        
-        if st.button("❌ Myths & Facts", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "HIV myths and misconceptions"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot.get_myths_info()})
-            st.rerun()
-        
-        if st.button("🧠 Mental Health", use_container_width=True, type="secondary"):
-            st.session_state.messages.append({"role": "user", "content": "mental health and HIV"})
-            st.session_state.messages.append({"role": "assistant", "content": chatbot.get_mental_health_info()})
-            st.rerun()
+    for column, topics in zip(st.columns(3), QUICK_TOPICS):
+        with column:
+            for label, topic in topics:
+                st.button(label, use_container_width=True, type="secondary",
+                          on_click=ask_quick_topic, args=(topic,))
     
     # Clear chat button at the bottom
     st.markdown("---")
-    if st.button("🗑️ Clear Conversation", use_container_width=True, type="primary"):
-        st.session_state.messages = [
-            {"role": "assistant", "content": "Hello! I'm your HIV/AIDS expert assistant. I can help with treatment guidelines, prevention strategies, clinical management, mental health integration, myths clarification, and much more. What would you like to know?"}
-        ]
-        st.rerun()
+    st.button("🗑️ Clear Conversation", use_container_width=True, type="primary", on_click=clear_chat)
+
+with tab3:
+    chat_tab()
 
 # -------------------------------
 # Single Footer
@@ -0,0 +1,760 @@
+import re
+import functools
+from types import MappingProxyType
+
+# -------------------------------
+# Clinical Thresholds
+# -------------------------------
+# Clinical cut-offs shared by the features, interpretation and analytics
+CD4_AHD_THRESHOLD = 200         # cells/mm³, WHO definition of advanced disease
+CD4_LOW_THRESHOLD = 350         # cells/mm³, needs close monitoring
+VL_SUPPRESSION_THRESHOLD = 1000 # copies/mL, WHO virological suppression
+BMI_UNDERWEIGHT = 18.5
+BMI_OBESE = 30
+
+# -------------------------------
+# ENHANCED COMPREHENSIVE HIV/AIDS EXPERT CHATBOT CLASS
+# -------------------------------
+# Reference data, shared by every chatbot instance as read-only views
+STATISTICS = MappingProxyType({
+    "global": {
+        "total_cases": "38.4 million",
+        "new_infections_2023": "1.3 million",
+        "aids_related_deaths_2023": "630,000",
+        "art_coverage": "76%"
+    },
+    "africa": {
+        "total_cases": "25.6 million",
+        "new_infections_2023": "800,000",
+        "aids_related_deaths_2023": "380,000",
+        "art_coverage": "78%",
+        "most_affected": "Eastern and Southern Africa"
+    },
+    "kenya": {
+        "total_cases": "1.4 million",
+        "prevalence_rate": "4.5%",
+        "new_infections_2023": "32,000",
+        "aids_related_deaths_2023": "19,000",
+        "art_coverage": "85%",
+        "mother_to_child_transmission": "8.7%"
+    }
+})
+
+TREATMENT_REGIMENS = MappingProxyType({
+    "first_line": {
+        "preferred": [
+            "TDF + 3TC/FTC + DTG (Dolutegravir)",
+            "TAF + 3TC/FTC + DTG",
+            "TDF + 3TC/FTC + EFV (Efavirenz)"
+        ],
+        "alternative": [
+            "AZT + 3TC + DTG",
+            "ABC + 3TC + DTG"
+        ]
+    },
+    "second_line": {
+        "options": [
+            "TDF/FTC + DTG (if failed on NNRTI-based regimen)",
+            "AZT + 3TC + ATV/r (Atazanavir/ritonavir)",
+            "TDF + 3TC + LPV/r (Lopinavir/ritonavir)"
+        ]
+    },
+    "third_line": {
+        "options": [
+            "DRV/r + DTG + optimized NRTI backbone",
+            "Newer agents: Bictegravir, Doravirine"
+        ]
+    }
+})
+
+NCD_INTEGRATION = MappingProxyType({
+    "hypertension": {
+        "prevalence_hiv": "35-40%",
+        "management": "ACE inhibitors preferred, monitor drug interactions with ART",
+        "screening": "Every clinical visit, control target <140/90 mmHg"
+    },
+    "diabetes": {
+        "prevalence_hiv": "10-15%",
+        "management": "Metformin first-line, watch for interactions with PIs",
+        "screening": "Annual fasting glucose, HbA1c every 6 months"
+    },
+    "mental_health": {
+        "depression_prevalence": "20-30%",
+        "management": "SSRIs compatible with ART, avoid St. John's wort",
+        "screening": "PHQ-9 at every clinical visit"
+    }
+})
+
+MYTHS_MISCONCEPTIONS = MappingProxyType({
+    "transmission": [
+        "HIV CANNOT be transmitted through: kissing, hugging, shaking hands, sharing utensils, toilet seats, mosquitoes",
+        "HIV CAN be transmitted through: unprotected sex, sharing needles, mother-to-child during pregnancy/birth/breastfeeding",
+        "People on treatment with undetectable viral load CANNOT transmit HIV sexually (U=U)"
+    ],
+    "treatment": [
+        "MYTH: You don't need ART if you feel fine - FACT: HIV damages immune system even without symptoms",
+        "MYTH: ART is toxic and will make you sick - FACT: Modern ART has minimal side effects",
+        "MYTH: You can stop treatment once viral load is undetectable - FACT: Treatment is lifelong"
+    ],
+    "prevention": [
+        "MYTH: PrEP is only for gay men - FACT: PrEP works for everyone at risk",
+        "MYTH: Condoms are 100% effective - FACT: Condoms are highly effective but not 100%",
+        "MYTH: You can tell if someone has HIV by looking - FACT: HIV has no specific visible signs"
+    ]
+})
+
+# Canned answers, built once at import and returned by reference
+_MENTAL_HEALTH_INFO = """**Mental Health and HIV - Comprehensive Guide**
+
+**Common Mental Health Conditions in PLHIV:**
+• **Depression**: 20-30% prevalence - screen with PHQ-9
+• **Anxiety disorders**: 15-20% prevalence - screen with GAD-7
+• **HIV-associated neurocognitive disorders (HAND)**: 15-50%
+• **Substance use disorders**: Higher prevalence than general population
+• **PTSD**: Common after HIV diagnosis
+
+**Screening Recommendations:**
+• **PHQ-9**: At every clinical visit for depression
+• **GAD-7**: For anxiety symptoms
+• **MMSE**: For cognitive impairment if symptoms present
+• **AUDIT**: For alcohol use disorders
+
+**Treatment Approaches:**
+• **Integrated care**: Mental health services within HIV clinics
+• **Pharmacotherapy**: SSRIs (compatible with ART)
+• **Psychotherapy**: CBT, supportive therapy, group therapy
+• **Peer support**: Support groups for PLHIV
+
+**Key Considerations:**
+• Mental health affects ART adherence and outcomes
+• Stigma prevents help-seeking behavior
+• Integrated services improve both mental health and HIV outcomes"""
+
+_HIV_DEFINITION = """**HIV (Human Immunodeficiency Virus) - Comprehensive Overview**
+
+**Definition:** HIV is a virus that attacks the body's immune system, specifically targeting CD4 cells (T-helper cells), which are crucial for fighting infections.
+
+**Virology:**
+- **Family**: Retroviridae
+- **Types**: HIV-1 (most common worldwide), HIV-2 (primarily West Africa)
+- **Structure**: Enveloped virus with RNA genome
+
+**Pathophysiology:**
+1. **Entry**: Binds to CD4 receptors and co-receptors (CCR5, CXCR4)
+2. **Integration**: Reverse transcriptase converts RNA to DNA, integrates into host genome
+3. **Replication**: Uses host cell machinery to produce new virus particles
+4. **Immune Destruction**: Progressive loss of CD4 cells leading to immunodeficiency
+
+**Global Impact**: Affected 38.4 million people worldwide in 2023"""
+
+_AHD_DEFINITION = """**Advanced HIV Disease (AHD) - Comprehensive Definition**
+
+**Definition:** AHD refers to advanced stage of HIV infection characterized by severe immunodeficiency, defined as:
+- CD4 cell count <200 cells/mm³ **OR**
+- WHO Clinical Stage 3 or 4 disease **regardless of CD4 count**
+
+**Epidemiology:**
+- 15-20% of people starting ART present with AHD
+- Higher mortality in first 3 months of treatment
+- More common in late presenters and re-starters
+
+**Management Principles:**
+1. **Rapid ART initiation** (within 7 days, same day if possible)
+2. **Comprehensive OI package**: screening, prevention, treatment
+3. **Enhanced adherence support**
+4. **Close clinical monitoring** (2-4 week intervals)
+5. **Integrated mental health and NCD screening**"""
+
+_CD4_DEFINITION = """**CD4 Cells - Comprehensive Explanation**
+
+**Definition:** CD4 cells (cluster of differentiation 4) are T-helper lymphocytes that play a central role in adaptive immune responses.
+
+**Normal Physiology:**
+- **Normal range**: 500-1500 cells/mm³
+- **Function**: Coordinate immune response, activate B cells and cytotoxic T cells
+
+**HIV Impact:**
+- **Direct killing**: HIV replication destroys CD4 cells
+- **Chronic activation**: Leads to exhaustion and apoptosis
+
+**Clinical Interpretation:**
+- **>500**: Normal immune function
+- **200-500**: Mild to moderate immunodeficiency
+- **<200**: Severe immunodeficiency (AHD criteria)
+- **<100**: Critical risk for opportunistic infections"""
+
+_VIRAL_LOAD_DEFINITION = """**Viral Load - Comprehensive Explanation**
+
+**Definition:** Viral load measures the amount of HIV RNA in blood plasma, expressed as copies per milliliter (copies/mL).
+
+**Clinical Significance:**
+- **Treatment efficacy**: Primary marker of ART success
+- **Transmission risk**: Higher VL increases transmission probability
+
+**Interpretation:**
+- **Suppressed**: <1000 copies/mL (treatment goal)
+- **Undetectable**: <50 copies/mL (optimal suppression)
+- **Unsuppressed**: ≥1000 copies/mL (needs intervention)
+
+**Public Health Impact:**
+- **U=U**: Undetectable = Untransmittable
+- **Treatment as prevention**: ART reduces transmission by 96%"""
+
+_ART_DEFINITION = """**ART (Antiretroviral Therapy) - Comprehensive Overview**
+
+**Definition:** ART refers to the combination of antiretroviral drugs used to treat HIV infection.
+
+**Classes of ARVs:**
+1. **NRTIs**: Nucleoside Reverse Transcriptase Inhibitors (TDF, 3TC, ABC)
+2. **NNRTIs**: Non-Nucleoside Reverse Transcriptase Inhibitors (EFV, NVP)
+3. **PIs**: Protease Inhibitors (LPV/r, ATV/r)
+4. **INSTIs**: Integrase Strand Transfer Inhibitors (DTG, RAL)
+
+**Treatment Principles:**
+- **Combination therapy**: Minimum 3 drugs from ≥2 classes
+- **Adherence**: >95% adherence required for success
+- **Lifelong treatment**: No current cure, but controllable
+- **Rapid initiation**: Start ASAP after diagnosis"""
+
+_PREVENTION_INFO = """**HIV Prevention - Comprehensive Strategies**
+
+**Biomedical Interventions:**
+- **PrEP** (Pre-Exposure Prophylaxis): Daily TDF/FTC for HIV-negative at-risk individuals
+- **PEP** (Post-Exposure Prophylaxis): 28-day ART course started within 72 hours of exposure
+- **VMMC** (Voluntary Medical Male Circumcision): 60% reduction in female-to-male transmission
+- **Treatment as Prevention**: ART reduces transmission risk by 96%
+
+**Behavioral Interventions:**
+- **Condom use**: Male and female condoms
+- **Harm reduction**: Needle exchange programs for PWID
+- **Testing and counseling**: Regular HIV testing
+
+**Structural Interventions:**
+- **Stigma reduction programs**
+- **Legal protections**
+- **Economic empowerment**
+- **Comprehensive sex education**"""
+
+_TRANSMISSION_INFO = """**HIV Transmission - Comprehensive Guide**
+
+**Established Routes:**
+1. **Sexual Transmission** (75-85% of cases)
+   - Unprotected anal/vaginal sex
+   - Higher risk: receptive anal > insertive anal > vaginal
+
+2. **Blood-borne Transmission**
+   - Contaminated needles (PWID, healthcare)
+   - Blood transfusions (rare with screening)
+
+3. **Perinatal Transmission**
+   - During pregnancy, delivery, or breastfeeding
+   - Risk: 15-45% without intervention, <5% with ART
+
+**NO Transmission Through:**
+- Kissing, hugging, shaking hands
+- Sharing utensils, toilet seats
+- Mosquito bites, sweat, tears
+- Swimming pools, air
+
+**Risk Reduction:**
+- **ART**: Viral suppression eliminates sexual transmission
+- **Condoms**: 80-95% reduction in transmission
+- **PrEP**: >90% reduction when adherent
+- **Medical male circumcision**: 60% reduction in male acquisition"""
+
+_SYMPTOMS_INFO = """**HIV Symptoms - Comprehensive Overview**
+
+**Acute HIV Infection (2-4 weeks post-exposure):**
+- Fever, chills, rash
+- Sore throat, mouth ulcers
+- Fatigue, muscle aches
+- Swollen lymph nodes
+- Night sweats
+
+**Clinical Latency Stage (Asymptomatic):**
+- May last 8-10 years without treatment
+- Progressive immune decline continues
+
+**Symptomatic HIV (Moderate Immunodeficiency):**
+- Recurrent respiratory infections
+- Herpes zoster (shingles)
+- Oral candidiasis (thrush)
+- Chronic diarrhea
+- Unexplained weight loss
+
+**AIDS-Defining Conditions (Severe Immunodeficiency):**
+- Opportunistic infections (PJP, toxoplasmosis, cryptococcosis)
+- HIV wasting syndrome (>10% weight loss)
+- Kaposi sarcoma, lymphomas
+- HIV-associated neurocognitive disorders"""
+
+_TESTING_INFO = """**HIV Testing - Comprehensive Guide**
+
+**Testing Technologies:**
+1. **Rapid Tests** (Point-of-care)
+   - Results in 20 minutes
+   - Fingerstick or oral fluid
+   - >99% sensitivity/specificity
+
+2. **4th Generation ELISA**
+   - Detects both p24 antigen and antibodies
+   - Window period: 2-3 weeks
+   - Gold standard for diagnosis
+
+3. **Viral Load PCR**
+   - For infant diagnosis and treatment monitoring
+   - Not for routine diagnosis
+
+**Testing Recommendations:**
+- **Universal**: All adults/adolescents at least once
+- **High-risk**: Every 3-6 months
+- **Pregnant women**: Every pregnancy
+- **Partner testing**: Encourage mutual disclosure"""
+
+_OI_INFO = """**Opportunistic Infections - Comprehensive Guide**
+
+**Common OIs in AHD:**
+
+1. **Tuberculosis (TB)**
+   - Most common OI globally
+   - Screening: Symptom screen at every visit
+   - Prevention: Isoniazid preventive therapy (IPT)
+
+2. **Cryptococcal Meningitis**
+   - CD4 <100, high mortality
+   - Screening: CrAg in blood if CD4 <100
+   - Treatment: Amphotericin B + flucytosine
+
+3. **Pneumocystis jirovecii Pneumonia (PJP)**
+   - CD4 <200, subacute respiratory symptoms
+   - Prophylaxis: Cotrimoxazole if CD4 <200
+
+4. **Toxoplasmosis**
+   - CD4 <100, CNS symptoms
+   - Prophylaxis: Cotrimoxazole
+
+**Prevention Strategy:**
+- **Cotrimoxazole**: CD4 <200 or WHO stage 3/4
+- **Fluconazole**: CD4 <100 in endemic areas
+- **IPT**: TB preventive therapy"""
+
+_WHO_STAGING = """**WHO Clinical Staging System - Comprehensive**
+
+**Stage 1:** Asymptomatic, Persistent generalized lymphadenopathy
+
+**Stage 2:** Moderate unexplained weight loss, Recurrent respiratory infections, Herpes zoster
+
+**Stage 3:** Unexplained severe weight loss, Unexplained chronic diarrhea, Pulmonary tuberculosis
+
+**Stage 4 (AIDS-Defining):** HIV wasting syndrome, Pneumocystis pneumonia, Extrapulmonary tuberculosis, Kaposi sarcoma
+
+**Clinical Utility:**
+- Guides OI prophylaxis needs
+- Determines ART urgency
+- Predicts disease progression
+- Informs prognosis and monitoring frequency"""
+
+_PMTCT_INFO = """**Prevention of Mother-to-Child Transmission (PMTCT) - Comprehensive Guide**
+
+**Four-Pronged Approach:**
+1. **Primary prevention** of HIV in women
+2. **Prevent unintended pregnancies** in HIV+ women
+3. **Prevent transmission** to infants
+4. **Provide treatment and support** to HIV+ mothers and families
+
+**ART in Pregnancy:**
+- **Preferred**: TDF + 3TC/FTC + DTG
+- **Start ASAP** regardless of CD4 or gestational age
+- **Continue throughout** pregnancy, delivery, and breastfeeding
+
+**Infant Prophylaxis:**
+- **High risk**: NVP for 6-12 weeks
+- **Low risk**: NVP for 6 weeks
+- **Breastfeeding**: Continue maternal ART, infant prophylaxis if high risk
+
+**Delivery Planning:**
+- **Viral load <1000**: Vaginal delivery appropriate
+- **Viral load ≥1000**: Consider C-section at 38 weeks
+- **Avoid invasive procedures** if unknown status
+
+**Breastfeeding:**
+- **Recommend**: Exclusive breastfeeding for 6 months
+- **Continue**: ART throughout breastfeeding period
+- **Wean gradually** over 1 month when transitioning"""
+
+_TB_HIV_INFO = """**TB-HIV Coinfection Management - Comprehensive Guide**
+
+**Epidemiology:**
+- **HIV increases TB risk** 15-20 times
+- **Leading cause of death** in PLHIV
+- **Global burden**: 8% of TB cases are HIV-positive
+
+**Screening:**
+- **At every visit**: WHO 4-symptom screen (cough, fever, night sweats, weight loss)
+- **If any symptom**: GeneXpert MTB/RIF preferred
+- **All TB patients**: Routine HIV testing
+
+**Diagnosis Challenges:**
+- **Atypical presentations** in advanced HIV
+- **Higher rates** of extrapulmonary TB
+- **Lower sensitivity** of sputum smear
+
+**Treatment:**
+- **Start ART** within 2 weeks of TB treatment (all CD4 counts)
+- **Watch for**: Immune reconstitution inflammatory syndrome (IRIS)
+- **Drug interactions**: Rifampicin reduces PI levels
+
+**Prevention:**
+- **IPT** for all PLHIV without active TB
+- **Duration**: 6-36 months depending on setting
+- **TPT** (TB preventive therapy) reduces mortality by 37%"""
+
+_COMPREHENSIVE_SUFFIX = """I want to provide you with accurate, evidence-based information about HIV/AIDS. 
+
+I specialize in comprehensive HIV topics including:
+• **HIV treatment guidelines** and ART regimens
+• **Prevention strategies** (PrEP, PEP, condoms, U=U)
+• **Testing and diagnosis** approaches  
+• **WHO clinical staging** and management
+• **Opportunistic infections** and prevention
+• **PMTCT** and pediatric HIV care
+• **TB-HIV coinfection** management
+• **HIV and NCDs** (hypertension, diabetes, mental health)
+• **Mental health integration** in HIV care
+• **Myths and misconceptions** about HIV
+• **Epidemiology and statistics**
+
+Could you please rephrase your question or ask about one of these specific HIV/AIDS topics? I'm here to provide you with the most current, evidence-based information."""
+
+_GREETING_RESPONSE = "Hello! I'm your HIV/AIDS expert assistant. How can I help you with HIV-related questions today?"
+
+_HIGH_RISK_RECOMMENDATIONS = """• **Urgent ART initiation** (within 7 days)
+• **Comprehensive OI screening** (TB, cryptococcus)
+• **Cotrimoxazole preventive therapy**
+• **Enhanced adherence counseling**
+• **Close follow-up** (2-4 weeks)
+• **Mental health screening** (PHQ-9, anxiety)
+• **NCD screening** (hypertension, diabetes)
+"""
+
+_LOW_RISK_RECOMMENDATIONS = """• **Continue routine ART care**
+• **Standard monitoring schedule**
+• **Prevention counseling**
+• **Regular viral load monitoring**
+• **Annual NCD screening**
+• **Mental health assessment**
+"""
+
+# Greeting words must stand alone (no letter either side); the two phrases
+# match anywhere, as before. One compiled pattern replaces tokenising the input
+_GREETING_RE = re.compile(r"(?<![a-z])(?:hello|hi|hey|greetings)(?![a-z])|good morning|good afternoon")
+
+def _keyword_groups(*groups):
+    """Compile keyword groups (highest priority first) into one lookahead alternation"""
+    return re.compile("(?=" + "|".join("(%s)" % "|".join(map(re.escape, group)) for group in groups) + ")")
+
+def _first_group(keyword_groups, text):
+    """Number of the highest-priority group with a keyword in text (from 1), or 0"""
+    return min((match.lastindex for match in keyword_groups.finditer(text)), default=0)
+
+# Sub-topic selection inside a route; index 0 of each option tuple is the fallback
+_REGION_KEYWORDS = _keyword_groups(("kenya", "nairobi"), ("africa", "african"))
+_REGION_OPTIONS = ("global", "kenya", "africa")
+_REGIMEN_KEYWORDS = _keyword_groups(("second",), ("third",))
+_REGIMEN_OPTIONS = ("first_line", "second_line", "third_line")
+_NCD_KEYWORDS = _keyword_groups(("hypertension", "blood pressure", "bp"), ("diabetes", "sugar"),
+                                ("mental", "depression", "anxiety", "psych"))
+_NCD_OPTIONS = (None, "hypertension", "diabetes", "mental_health")
+_MYTH_KEYWORDS = _keyword_groups(("transmit", "spread", "catch"), ("treatment", "art", "med"),
+                                 ("prevent", "prevention", "condom"))
+_MYTH_OPTIONS = (None, "transmission", "treatment", "prevention")
+
+def _fixed_answer(answer):
+    """Route handler that returns the same canned answer whatever was asked"""
+    return lambda chatbot, user_input: answer
+
+class HIVExpertChatbot:
+    # Shared, module-level reference data (not rebuilt per instance)
+    statistics = STATISTICS
+    treatment_regimens = TREATMENT_REGIMENS
+    ncd_integration = NCD_INTEGRATION
+    myths_misconceptions = MYTHS_MISCONCEPTIONS
+
+    def __init__(self):
+        self.current_year = 2025
+
+        # The reference data is static, so render each region/regimen answer once
+        self._stats_rendered = {region: self._render_statistics(region, stats)
+                                for region, stats in self.statistics.items()}
+        self._treatment_rendered = {regimen_type: self._render_treatment(regimen_type, regimen)
+                                    for regimen_type, regimen in self.treatment_regimens.items()}
+        # Likewise each NCD and myth answer, with the topic overview under None
+        self._ncd_rendered = {condition: self._render_ncd(condition)
+                              for condition in (None, *self.ncd_integration)}
+        self._myths_rendered = {category: self._render_myths(category)
+                                for category in (None, *self.myths_misconceptions)}
+
+        # get_response is deterministic in the normalised input, so memoise it
+        # for the life of the (process-wide) chatbot
+        self._lookup = functools.lru_cache(maxsize=512)(self._route)
+        # Likewise for the interpretation, keyed on the exact values it reads
+        # (typed, so 200 and 200.0 keep their own formatting)
+        self._interpretation = functools.lru_cache(maxsize=256, typed=True)(self._render_interpretation)
+
+        # Answers to the fixed Quick Access prompts, rendered once so a button
+        # click is a dict lookup
+        self.quick_responses = {
+            "HIV statistics Kenya 2025": self.get_statistics("kenya"),
+            "first line ART regimens": self.get_treatment_info("first_line"),
+            "HIV and NCDs": self.get_ncd_info(),
+            "HIV prevention methods": self._get_prevention_info(),
+            "PMTCT guidelines": self._get_pmtct_info(),
+            "TB HIV coinfection": self._get_tb_hiv_info(),
+            "WHO clinical staging": self._get_who_staging(),
+            "HIV myths and misconceptions": self.get_myths_info(),
+            "mental health and HIV": self.get_mental_health_info(),
+        }
+
+    def _render_statistics(self, region, stats):
+        parts = [f"**HIV Statistics for {region.upper()} ({self.current_year} estimates):**\n\n"]
+        parts.extend(f"• **{key.replace('_', ' ').title()}**: {value}\n" for key, value in stats.items())
+        parts.append(f"\n*Source: WHO/UNAIDS {self.current_year} estimates*")
+        return "".join(parts)
+
+    def _render_treatment(self, regimen_type, regimen):
+        parts = [f"**{regimen_type.replace('_', ' ').title()} ART Regimens:**\n\n"]
+        
+        if "preferred" in regimen:
+            parts.append("**Preferred Regimens:**\n")
+            parts.extend(f"• {option}\n" for option in regimen["preferred"])
+            parts.append("\n")
+        
+        if "alternative" in regimen:
+            parts.append("**Alternative Regimens:**\n")
+            parts.extend(f"• {option}\n" for option in regimen["alternative"])
+            parts.append("\n")
+        
+        if "options" in regimen:
+            parts.extend(f"• {option}\n" for option in regimen["options"])
+        
+        parts.append(f"\n*Based on WHO {self.current_year} Consolidated Guidelines*")
+        return "".join(parts)
+
+    def get_statistics(self, region="global"):
+        """Get HIV statistics for different regions"""
+        rendered = self._stats_rendered.get(region.lower())
+        if rendered is not None:
+            return rendered
+        return f"Statistics for {region} not available. Try 'global', 'africa', or 'kenya'."
+
+    def get_treatment_info(self, regimen_type="first_line"):
+        """Get detailed treatment regimen information"""
+        rendered = self._treatment_rendered.get(regimen_type)
+        if rendered is not None:
+            return rendered
+        return "Regimen type not found. Try 'first_line', 'second_line', or 'third_line'."
+
+    def _render_ncd(self, condition):
+        if condition is None:
+            parts = ["**HIV and Non-Communicable Diseases (NCDs):**\n\n", "Common NCDs in PLHIV:\n"]
+            parts.extend(f"• {condition.title()}\n" for condition in self.ncd_integration)
+            parts.append("\nAsk about specific conditions for detailed management guidelines.")
+            return "".join(parts)
+        
+        parts = [f"**HIV and {condition.title()} Comorbidity Management:**\n\n"]
+        parts.extend(f"• **{key.replace('_', ' ').title()}**: {value}\n"
+                     for key, value in self.ncd_integration[condition].items())
+        
+        parts.append("\n*Key Considerations:*\n")
+        if condition == "hypertension":
+            parts.append("- Avoid drug interactions between ART and antihypertensives\n")
+            parts.append("- Monitor renal function with TDF-containing regimens\n")
+            parts.append("- Target BP <140/90 mmHg in PLHIV\n")
+        elif condition == "diabetes":
+            parts.append("- PI-based regimens may increase diabetes risk\n")
+            parts.append("- Monitor weight gain with newer INSTIs\n")
+            parts.append("- Screen all PLHIV for diabetes annually\n")
+        elif condition == "mental_health":
+            parts.append("- Depression affects ART adherence significantly\n")
+            parts.append("- Integrated mental health services improve outcomes\n")
+            parts.append("- Screen all patients with PHQ-9 at each visit\n")
+        
+        return "".join(parts)
+
+    def _render_myths(self, category):
+        if category is None:
+            parts = ["**Common HIV Myths and Misconceptions:**\n\n", "**Categories:**\n"]
+            parts.extend(f"• {category.title()}\n" for category in self.myths_misconceptions)
+            parts.append("\nAsk about specific categories for detailed myth-busting information.")
+            return "".join(parts)
+        
+        parts = [f"**HIV Myths & Facts - {category.title()}: **\n\n"]
+        parts.extend(f"• {myth}\n" for myth in self.myths_misconceptions[category])
+        return "".join(parts)
+
+    def get_ncd_info(self, condition=None):
+        """Get information about HIV and NCD comorbidities"""
+        # Unknown conditions fall back to the overview, as does no condition
+        return self._ncd_rendered.get(condition.lower() if condition else None, self._ncd_rendered[None])
+
+    def get_myths_info(self, category=None):
+        """Get information about HIV myths and misconceptions"""
+        return self._myths_rendered.get(category.lower() if category else None, self._myths_rendered[None])
+
+    def get_mental_health_info(self):
+        """Comprehensive mental health information for PLHIV"""
+        return _MENTAL_HEALTH_INFO
+
+    def interpret_prediction(self, prediction, probability, features):
+        """Interpret model prediction with clinical insights"""
+        # Accept a feature row as a pandas Series too; plain dict lookups skip
+        # Series indexing overhead for the six fields read below
+        if hasattr(features, 'to_dict'):
+            features = features.to_dict()
+        return self._interpretation(
+            prediction, probability,
+            features.get('Latest CD4 Result', 0),
+            features.get('Last VL Result', 0),
+            features.get('VL_Suppressed', 0),
+            features.get('Last_WHO_Stage_3', 0),
+            features.get('Last_WHO_Stage_4', 0),
+            features.get('BMI', 0),
+        )
+
+    def _render_interpretation(self, prediction, probability, cd4, vl, vl_suppressed, who_stage_3, who_stage_4, bmi):
+        """Build the interpretation markdown (memoised as self._interpretation)"""
+        high_risk = prediction == 1
+        confident = probability > 0.7 or probability < 0.3
+
+        parts = [
+            "**Prediction Interpretation:**\n",
+            f"• **Risk Level**: {'High' if high_risk else 'Low'}",
+            f"• **Probability**: {probability:.1%}",
+            f"• **Confidence**: {'High' if confident else 'Moderate'}\n",
+            "**Key Contributing Factors:**",
+        ]
+
+        if cd4 < CD4_AHD_THRESHOLD:
+            parts.append(f"• **Critical CD4**: {cd4} cells/mm³ (AHD threshold <200)")
+        elif cd4 < CD4_LOW_THRESHOLD:
+            parts.append(f"• **Low CD4**: {cd4} cells/mm³ (needs close monitoring)")
+
+        if not vl_suppressed and vl > 0:
+            parts.append(f"• **Unsuppressed VL**: {vl:,} copies/mL")
+
+        if who_stage_4:
+            parts.append("• **WHO Stage 4**: Severe symptoms present")
+        elif who_stage_3:
+            parts.append("• **WHO Stage 3**: Advanced symptoms present")
+
+        if bmi < BMI_UNDERWEIGHT:
+            parts.append(f"• **Low BMI**: {bmi:.1f} (underweight)")
+        elif bmi > BMI_OBESE:
+            parts.append(f"• **High BMI**: {bmi:.1f} (obese)")
+
+        parts.append("\n**Clinical Recommendations:**")
+        parts.append(_HIGH_RISK_RECOMMENDATIONS if high_risk else _LOW_RISK_RECOMMENDATIONS)
+
+        return "\n".join(parts)
+
+    def _route_statistics(self, user_input):
+        return self.get_statistics(_REGION_OPTIONS[_first_group(_REGION_KEYWORDS, user_input)])
+
+    def _route_treatment(self, user_input):
+        return self.get_treatment_info(_REGIMEN_OPTIONS[_first_group(_REGIMEN_KEYWORDS, user_input)])
+
+    def _route_ncd(self, user_input):
+        condition = _NCD_OPTIONS[_first_group(_NCD_KEYWORDS, user_input)]
+        if condition == "mental_health":
+            return self.get_mental_health_info()
+        return self.get_ncd_info(condition)
+
+    def _route_myths(self, user_input):
+        return self.get_myths_info(_MYTH_OPTIONS[_first_group(_MYTH_KEYWORDS, user_input)])
+
+    def get_response(self, user_input):
+        # Case and runs of whitespace are folded so near-duplicate phrasings
+        # ("What is  CD4?" / "what is cd4?") share one cache entry and route alike
+        return self._lookup(" ".join(user_input.lower().split()))
+
+    def _route(self, user_input):
+        """Answer an already-normalised question (memoised as self._lookup)"""
+        # Single scan of the input; the highest-priority route hit wins
+        hit = _first_group(self._ROUTER, user_input)
+        if hit:
+            return self._ROUTES[hit - 1][1](self, user_input)
+
+        # Greetings match whole words only, so "hi" no longer fires on "this"
+        if _GREETING_RE.search(user_input):
+            return _GREETING_RESPONSE
+
+        return self._get_comprehensive_response(user_input)
+
+    def _get_hiv_definition(self):
+        return _HIV_DEFINITION
+
+    def _get_ahd_definition(self):
+        return _AHD_DEFINITION
+
+    def _get_cd4_definition(self):
+        return _CD4_DEFINITION
+
+    def _get_viral_load_definition(self):
+        return _VIRAL_LOAD_DEFINITION
+
+    def _get_art_definition(self):
+        return _ART_DEFINITION
+
+    def _get_prevention_info(self):
+        return _PREVENTION_INFO
+
+    def _get_transmission_info(self):
+        return _TRANSMISSION_INFO
+
+    def _get_symptoms_info(self):
+        return _SYMPTOMS_INFO
+
+    def _get_testing_info(self):
+        return _TESTING_INFO
+
+    def _get_oi_info(self):
+        return _OI_INFO
+
+    def _get_who_staging(self):
+        return _WHO_STAGING
+
+    def _get_pmtct_info(self):
+        return _PMTCT_INFO
+
+    def _get_tb_hiv_info(self):
+        return _TB_HIV_INFO
+
+    # Keyword routes in priority order, built once with the class: the first
+    # route with a keyword found in the user input answers it. Handlers are
+    # called as handler(chatbot, user_input)
+    _ROUTES = (
+        (("statistic", "prevalence", "rate", "number", "data", "how many", "cases"), _route_statistics),
+        (("treatment", "regimen", "art", "medication", "drug", "first-line", "second-line", "third-line", "arv"), _route_treatment),
+        (("ncd", "comorbidity", "hypertension", "blood pressure", "diabetes", "sugar", "mental health", "depression", "anxiety", "psych"), _route_ncd),
+        (("myth", "misconception", "false", "wrong", "believe", "think", "rumor", "stigma"), _route_myths),
+        (("pmtct", "pregnant", "pregnancy", "mother", "child", "vertical transmission", "breastfeed", "delivery"), _fixed_answer(_PMTCT_INFO)),
+        (("tb", "tuberculosis", "coinfection", "lung"), _fixed_answer(_TB_HIV_INFO)),
+        (("depression", "anxiety", "mental", "psychology", "stress", "trauma"), _fixed_answer(_MENTAL_HEALTH_INFO)),
+        (("what is hiv", "define hiv", "hiv means", "hiv definition"), _fixed_answer(_HIV_DEFINITION)),
+        (("what is ahd", "define ahd", "ahd means", "advanced hiv"), _fixed_answer(_AHD_DEFINITION)),
+        (("what is cd4", "define cd4", "cd4 means", "cd4 cells"), _fixed_answer(_CD4_DEFINITION)),
+        (("what is viral load", "define viral load", "viral load means", "vl"), _fixed_answer(_VIRAL_LOAD_DEFINITION)),
+        (("what is art", "define art", "art means", "antiretroviral"), _fixed_answer(_ART_DEFINITION)),
+        (("prevent", "prevention", "prep", "pep", "condom", "safe sex"), _fixed_answer(_PREVENTION_INFO)),
+        (("transmit", "transmission", "spread", "catch", "get hiv"), _fixed_answer(_TRANSMISSION_INFO)),
+        (("symptom", "sign", "feel", "experience", "show"), _fixed_answer(_SYMPTOMS_INFO)),
+        (("test", "testing", "diagnose", "result", "positive", "negative"), _fixed_answer(_TESTING_INFO)),
+        (("oi", "opportunistic", "infection", "cryptococcus", "pjp", "toxo"), _fixed_answer(_OI_INFO)),
+        (("who stage", "staging"), _fixed_answer(_WHO_STAGING)),
+    )
+    # One compiled router: a group per route, in priority order, inside a
+    # lookahead so one C-level pass reports the best route hit at every position
+    _ROUTER = _keyword_groups(*(keywords for keywords, _ in _ROUTES))
+
+    def _get_comprehensive_response(self, user_input):
+        return f'I understand you\'re asking about: "{user_input}"\n\n' + _COMPREHENSIVE_SUFFIX